@@ -11,18 +11,69 @@ class Settings:
     centralizar nessa classe todas as configs
     """
     #API
-    API_HOST = str = os.getenv("API_HOST", "localhost")
-    API_PORT = int = os.getenv("API_PORT", 8000)
+    API_HOST: str = os.getenv("API_HOST", "localhost")
+    API_PORT: int = int(os.getenv("API_PORT", 8000))
 
     #LLM
-    OPENAI_API_KEY = str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 
     #logs
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # type: str
     LOG_FILE = "logs/app.log"
 
+    #USO E CUSTO
+    USAGE_BUFFER_SIZE = int(os.getenv("USAGE_BUFFER_SIZE", 65536))  # type: int
+    USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", 30))  # type: float
+    USAGE_STORAGE_DIR = os.getenv("USAGE_STORAGE_DIR", "data/usage")  # type: str
+    USAGE_COMPACT_FILES = int(os.getenv("USAGE_COMPACT_FILES", 16))  # type: int  (arquivos por nível antes de juntar)
+
+    #COMPACTAÇÃO DE CONTEXTO
+    # "none", "sliding_window", "keep_last_turns" ou "summarize"
+    COMPACTION_STRATEGY = os.getenv("COMPACTION_STRATEGY", "summarize")  # type: str
+    COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", 4))  # type: int
+    COMPACTION_SUMMARY_MODEL = os.getenv("COMPACTION_SUMMARY_MODEL", "gemini-2-5-flash")  # type: str
+    COMPACTION_TARGET_RATIO = float(os.getenv("COMPACTION_TARGET_RATIO", 0.9))  # type: float
+
+    #COMPRESSÃO HTTP
+    COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))  # type: int
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))  # type: int
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))  # type: int
+    MAX_DECOMPRESSED_BODY_SIZE = int(os.getenv("MAX_DECOMPRESSED_BODY_SIZE", 10 * 1024 * 1024))  # type: int
+
+    #PROFILING
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"  # type: bool
+    TRACE_HISTORY_SIZE = int(os.getenv("TRACE_HISTORY_SIZE", 1000))  # type: int
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # type: float
+    PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 60))  # type: int
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # type: str  (vazio desliga /debug)
+
+    #EMBEDDINGS E CACHE SEMÂNTICO
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 256))  # type: int
+    VECTOR_INDEX_IVF_THRESHOLD = int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", 50000))  # type: int
+    VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", 8))  # type: int
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"  # type: bool
+    # O embedding local é lexical: abaixo de ~0.9999 perguntas de sentido oposto viram "iguais"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9999))  # type: float
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 10000))  # type: int
+
+    #AGENTES
+    AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", 5))  # type: int
+    AGENT_TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", 10))  # type: float
+    AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", 8))  # type: int
+
+    #DEADLINES (segundos)
+    CHAT_REQUEST_TIMEOUT = float(os.getenv("CHAT_REQUEST_TIMEOUT", 30))  # type: float
+    MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", 120))  # type: float
+    DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.5))  # type: float
+
+    #WEBSOCKET
+    WS_MAX_SESSIONS = int(os.getenv("WS_MAX_SESSIONS", 50000))  # type: int
+    WS_SESSION_TTL = float(os.getenv("WS_SESSION_TTL", 3600))  # type: float
+    WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 600))  # type: float
+    WS_MAX_HISTORY_MESSAGES = int(os.getenv("WS_MAX_HISTORY_MESSAGES", 200))  # type: int
+
     #CONEXÕES BD
-    DATABASE_URL = str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
 
 settings = Settings()
\ No newline at end of file
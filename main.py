@@ -1,8 +1,14 @@
+import asyncio
 import logging
 import uvicorn
 from fastapi import FastAPI
 from config.settings import settings
+from src.api.debug import router as debug_router
+from src.api.middleware import CompressionMiddleware, TracingMiddleware
 from src.api.routes import router
+from src.core.sessions import session_manager
+from src.core.usage import usage_recorder
+from src.utils.profiling import trace_store
 from datetime import datetime
 from contextlib import asynccontextmanager
 
@@ -18,12 +24,32 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+async def flush_usage_periodically():
+    """Grava o buffer de uso em disco a cada USAGE_FLUSH_INTERVAL segundos."""
+    while True:
+        await asyncio.sleep(settings.USAGE_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(usage_recorder.flush)
+        except Exception as e:
+            logger.error(f"Erro ao gravar registros de uso: {e}")
+
+async def evict_sessions_periodically():
+    """Descarta sessões de WebSocket paradas há mais de WS_SESSION_TTL."""
+    while True:
+        await asyncio.sleep(min(settings.WS_SESSION_TTL, 60))
+        session_manager.evict_expired()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Iniciando API IA com Decorators...")
+    usage_task = asyncio.create_task(flush_usage_periodically())
+    sessions_task = asyncio.create_task(evict_sessions_periodically())
     logger.info("✅ Todos os sistemas operacionais!")
     yield
     logger.info("🛑 Encerrando API IA...")
+    usage_task.cancel()
+    sessions_task.cancel()
+    await asyncio.to_thread(usage_recorder.flush)
     logger.info("✅ Shutdown realizado com sucesso!")
 
 app = FastAPI(
@@ -33,7 +59,22 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    max_body_size=settings.MAX_DECOMPRESSED_BODY_SIZE,
+)
+
+app.add_middleware(
+    TracingMiddleware,
+    store=trace_store,
+    enabled=settings.TRACING_ENABLED,
+)
+
 app.include_router(router)
+app.include_router(debug_router)
 
 @app.get("/")
 async def root():
@@ -52,7 +93,10 @@ async def root():
             "docs": "/docs",
             "chat": "/api/v1/chat",
             "models": "/api/v1/models/{model_name}",
-            "validate": "/api/v1/validate-key"
+            "validate": "/api/v1/validate-key",
+            "usage": "/api/v1/usage",
+            "embeddings": "/api/v1/embeddings",
+            "ws_chat": "/api/v1/ws/chat"
         }
     }
 
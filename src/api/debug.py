@@ -0,0 +1,69 @@
+"""
+Rotas administrativas de diagnóstico.
+É como a "sala de máquinas": só entra quem tem o crachá (X-Admin-Token).
+"""
+
+import asyncio
+import hmac
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from config.settings import settings
+from src.utils.helpers import format_response
+from src.utils.profiling import sampling_profiler, trace_store
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(admin_token: str = Header(None, alias="X-Admin-Token")) -> None:
+    """
+    Exige o token de administrador.
+    Sem ADMIN_TOKEN configurado as rotas de debug ficam desligadas (404).
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token or not hmac.compare_digest(
+        admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Token de administrador inválido")
+
+
+router = APIRouter(prefix="/debug", tags=["Debug"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=settings.PROFILE_MAX_SECONDS),
+):
+    """
+    Roda o profiler por amostragem em todo o processo por N segundos.
+    Retorna pilhas no formato "collapsed" (flamegraph.pl, speedscope).
+    """
+    if sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="Já existe um profiling em andamento")
+
+    logger.info(f"🔬 Profiling do processo por {seconds}s")
+    try:
+        # Roda fora do event loop para continuar atendendo (e amostrando) requisições
+        stacks = await asyncio.to_thread(sampling_profiler.profile, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
+
+@router.get("/traces")
+async def list_traces(limit: int = Query(50, ge=1, le=1000)):
+    """Lista os traces mais recentes (requer TRACING_ENABLED)."""
+    traces = [trace.to_dict() for trace in trace_store.recent(limit)]
+    return format_response("Traces recentes", {"enabled": settings.TRACING_ENABLED, "traces": traces})
+
+
+@router.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    """Spans de uma requisição específica, pelo X-Request-ID."""
+    trace = trace_store.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{request_id}' não encontrado")
+    return format_response("Trace da requisição", trace.to_dict())
@@ -0,0 +1,330 @@
+"""
+Middlewares ASGI da API.
+É como a "portaria" do prédio: tudo que entra e sai passa por aqui.
+"""
+
+import json
+import logging
+import uuid
+import zlib
+from typing import Callable, Optional
+
+from starlette.exceptions import HTTPException
+
+from src.utils.profiling import TraceStore
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele só gzip é suportado
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+DECOMPRESSION_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+# Tipos que já vêm comprimidos e não ganham nada com nova compressão
+UNCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+# Pior caso do zstd: um bloco RLE de ~4 bytes vira 128 KiB
+ZSTD_MAX_EXPANSION = 32768
+
+
+class _BoundedDecompressor:
+    """
+    Descompressor incremental que nunca gera mais do que `max_length` bytes por chamada.
+    É como um "funil": o corpo pode ser uma bomba, mas só passa o que cabe.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        else:
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    @property
+    def eof(self) -> bool:
+        """True quando o fim do stream comprimido foi lido."""
+        return self._decompressor.eof
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        """
+        Descomprime `data` gerando no máximo `max_length` bytes.
+        Se o resultado tiver exatamente `max_length` bytes, pode ter sobrado saída.
+        """
+        if self.encoding == "gzip":
+            return self._decompressor.decompress(data, max_length)
+
+        # O zstd não aceita limite de saída: entrega a entrada em fatias
+        # pequenas o bastante para a saída de cada uma caber no limite
+        parts = []
+        produced = 0
+        position = 0
+        while position < len(data) and produced < max_length and not self.eof:
+            step = max((max_length - produced) // ZSTD_MAX_EXPANSION, 16)
+            part = self._decompressor.decompress(data[position:position + step])
+            position += step
+            produced += len(part)
+            parts.append(part)
+        return b"".join(parts)[:max_length]
+
+
+def _make_decompressor(encoding: str) -> Optional[_BoundedDecompressor]:
+    """Cria um descompressor incremental para o Content-Encoding informado."""
+    if encoding == "gzip" or (encoding == "zstd" and zstandard is not None):
+        return _BoundedDecompressor(encoding)
+    return None
+
+
+def _make_compressor(encoding: str, gzip_level: int, zstd_level: int):
+    """Cria um compressor incremental (compress, flush) para a resposta."""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+        return compressor.compress, compressor.flush
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe a melhor codificação suportada a partir do Accept-Encoding.
+
+    Args:
+        accept_encoding: Valor do header (ex.: "gzip, zstd;q=0.9").
+
+    Returns:
+        "zstd", "gzip" ou None se o cliente não aceitar nenhuma.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(SUPPORTED_ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Aceita corpos de requisição com Content-Encoding gzip/zstd e comprime
+    respostas conforme o Accept-Encoding do cliente.
+
+    A descompressão é feita em streaming, pedaço a pedaço, conforme a rota
+    lê o corpo: o corpo comprimido nunca é acumulado inteiro em memória.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        max_body_size: int = 10 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = _headers(scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+
+        if content_encoding not in ("", "identity"):
+            decompressor = _make_decompressor(content_encoding)
+            if decompressor is None:
+                await _send_error(send, 415, f"Content-Encoding '{content_encoding}' não suportado")
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+            receive = self._decompressing_receive(receive, decompressor)
+
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is not None:
+            send = self._compressing_send(send, encoding)
+
+        await self.app(scope, receive, send)
+
+    def _decompressing_receive(self, receive: Callable, decompressor: _BoundedDecompressor) -> Callable:
+        """
+        Envolve o `receive` para entregar o corpo já descomprimido.
+
+        Cada pedaço é descomprimido com limite de saída, então um corpo
+        pequeno que expande para gigabytes é recusado (413) antes de
+        ocupar memória. Erros viram HTTPException para passarem pelos
+        handlers da aplicação.
+        """
+        total = 0
+        received = 0
+
+        async def wrapped():
+            nonlocal total, received
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            try:
+                body = decompressor.decompress(chunk, self.max_body_size - total + 1)
+            except DECOMPRESSION_ERRORS as e:
+                logger.warning(f"Corpo comprimido inválido: {e}")
+                raise HTTPException(status_code=400, detail="Corpo comprimido inválido")
+
+            total += len(body)
+            if total > self.max_body_size:
+                logger.warning(f"Corpo descomprimido passou de {self.max_body_size} bytes, recusando")
+                raise HTTPException(
+                    status_code=413,
+                    detail="Corpo da requisição excede o limite após descompressão"
+                )
+
+            if not message.get("more_body", False) and received and not decompressor.eof:
+                logger.warning("Corpo comprimido truncado")
+                raise HTTPException(status_code=400, detail="Corpo comprimido incompleto")
+
+            return {**message, "body": body}
+
+        return wrapped
+
+    def _compressing_send(self, send: Callable, encoding: str) -> Callable:
+        """Envolve o `send` para comprimir o corpo da resposta quando vale a pena."""
+        state = {"start": None, "compress": None, "flush": None, "passthrough": False}
+
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                response_headers = _headers(message)
+                content_type = response_headers.get("content-type", "")
+                if "content-encoding" in response_headers or content_type.startswith(UNCOMPRESSIBLE_TYPES):
+                    state["passthrough"] = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["compress"] is None:
+                start = state["start"]
+                if not more_body and len(body) < self.minimum_size:
+                    # Resposta pequena: comprimir custaria mais do que economiza
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compress, flush = _make_compressor(encoding, self.gzip_level, self.zstd_level)
+                state["compress"], state["flush"] = compress, flush
+                headers = [
+                    (name, value) for name, value in start["headers"]
+                    if name.lower() not in (b"content-length", b"vary")
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    compressed = compress(body) + flush()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            chunk = state["compress"](body)
+            if more_body:
+                if encoding == "gzip":
+                    chunk += state["flush"](zlib.Z_SYNC_FLUSH)
+                else:
+                    chunk += state["flush"](zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            else:
+                chunk += state["flush"]()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        return wrapped
+
+
+class TracingMiddleware:
+    """
+    Correlaciona a requisição por X-Request-ID e, se habilitado, coleta spans.
+
+    O ID recebido do cliente é reaproveitado (ou um novo é gerado) e sempre
+    volta no header da resposta. Com tracing ligado, os spans vão também
+    no header Server-Timing e ficam disponíveis em /debug/traces.
+    """
+
+    def __init__(self, app, store: TraceStore, enabled: bool = False):
+        self.app = app
+        self.store = store
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _headers(scope).get("x-request-id") or uuid.uuid4().hex
+        trace, tokens = (None, None)
+        if self.enabled:
+            trace, tokens = self.store.start(request_id, scope.get("path", ""))
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                if trace is not None and trace.spans:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            if trace is not None:
+                self.store.finish(trace, tokens)
+
+
+def _headers(message) -> dict:
+    """Converte a lista de headers ASGI em dicionário minúsculo."""
+    return {
+        name.decode("latin-1").lower(): value.decode("latin-1")
+        for name, value in message.get("headers", [])
+    }
+
+
+async def _send_error(send: Callable, status_code: int, message: str) -> None:
+    """Envia uma resposta de erro JSON direto pelo ASGI."""
+    body = json.dumps({"error": "COMPRESSION_ERROR", "message": message}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
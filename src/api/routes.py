@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, Header, Query, Depends
+from fastapi import APIRouter, HTTPException, Header, Query, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from typing import Optional
+import asyncio
+import hmac
+import json
 import logging
 import time
 
+from config.settings import settings
 from src.core.ai_service import AIService
-from src.core.data_types import AIrequest, AIResponse, ChatMessage, MessageRole, ModelType
-from src.utils.error_handler import AIServiceError, handle_validation_error
+from src.core.usage import GROUP_COLUMNS, usage_recorder
+from src.core.data_types import AIrequest, AIResponse, ChatMessage, MessageRole, ModelType, EmbeddingRequest, EmbeddingResponse
+from src.core.embeddings import EMBEDDING_MODEL, embed_texts
+from src.core.sessions import ChatSession, session_manager
+from src.utils.error_handler import AIServiceError, DeadlineExceededError, RequestCancelledError, handle_validation_error
+from src.utils.deadline import Deadline, deadline_scope, request_deadline, run_with_deadline
 from src.utils.helpers import calculate_tokens, format_response
 from src.utils.decorators import timer, log_calls, cache_result
+from src.utils.profiling import span
 
 logger = logging.getLogger(__name__)
 
@@ -16,36 +26,8 @@ router = APIRouter(prefix="/api/v1", tags=["AI"])
 
 ai_service = AIService()
 
-@router.post("/chat", response_model=AIResponse)
-async def chat_with_ai(request:AIrequest):
-    """
-    Endpoint para interagir com a IA.
-    
-    Args:
-        request: Dados da conversa(já validados pelo Pydantic).
-    
-    Returns:
-        return: Resposta da IA formatada.
-    """
-    logger.info(f"Recebida requisição para modelo {request.model}")
-
-#simulação previa de processamento
-    try:
-        total_tokens = sum(calculate_tokens(msg.content) for msg in request.messages)
-        response_content = f"OLá! Recebi {len(request.messages)} mensagens usando {total_tokens} tokens."
-
-        #REPOSTA PADRONIZADA
-        ai_response = AIResponse(
-            response=response_content,
-            model_used=request.model,
-            tokens_used=total_tokens,
-            processing_time=0.5  # Simulação de tempo de processamento
-        )
-        logger.info(f"Resposta gerada com sucesso usando o modelo {request.model}")
-        return ai_response
-    except Exception as e:
-        logger.error(f"Erro ao processar a requisição: {e}")
-        raise HTTPException(status_code=500, detail="Erro interno do servidor ao processar a requisição")
+WS_INBOX_SIZE = 8  # frames aguardando enquanto um turno está em andamento
+_WS_IDLE = object()  # sentinela do timer de ociosidade do WebSocket
 
 @router.get("/models")
 async def list_models():
@@ -108,10 +90,13 @@ def get_model_recommendation(model) -> str:
 @log_calls(include_args=False)
 async def chat_with_ai(
     request: AIrequest,  # Corrigido para AIrequest
-    api_key: str = Header(None, alias="X-API-Key")
+    http_request: Request,
+    api_key: str = Header(None, alias="X-API-Key"),
+    deadline: Deadline = Depends(request_deadline(settings.CHAT_REQUEST_TIMEOUT)),
 ):
     """
     Conversa com IA usando decorators para funcionalidades avançadas.
+    O trabalho é cancelado se o prazo (X-Request-Timeout) acabar ou o cliente desconectar.
     """
     try:
         if not api_key:
@@ -119,8 +104,24 @@ async def chat_with_ai(
                 status_code=401,
                 detail="API key obrigatória no header X-API-Key"
             )
-        response = ai_service.generate_response(request, api_key)
-        return response
+        with deadline_scope(deadline):
+            # Roda fora do event loop; o deadline segue junto via contextvars
+            response = await run_with_deadline(
+                asyncio.to_thread(ai_service.generate_response, request, api_key),
+                deadline,
+                is_disconnected=http_request.is_disconnected,
+                poll_interval=settings.DISCONNECT_POLL_INTERVAL,
+            )
+        with span("serialization"):
+            return JSONResponse(content=jsonable_encoder(response))
+    except HTTPException:
+        raise
+    except DeadlineExceededError as e:
+        logger.warning(f"Prazo esgotado: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except RequestCancelledError as e:
+        logger.warning(f"Requisição cancelada: {e}")
+        raise HTTPException(status_code=499, detail=str(e))
     except AIServiceError as e:
         logger.error(f"Erro do serviço IA: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -128,6 +129,181 @@ async def chat_with_ai(
         logger.error(f"Erro inesperado: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.post("/embeddings", response_model=EmbeddingResponse)
+def create_embeddings(request: EmbeddingRequest):
+    """
+    Gera embeddings locais e determinísticos para uma lista de textos.
+    É como dar um "CEP" para cada texto: textos parecidos moram perto.
+
+    Rota síncrona de propósito: o hashing é CPU puro e roda no threadpool,
+    sem travar o event loop.
+    """
+    dimensions = request.dimensions or settings.EMBEDDING_DIM
+    vectors = embed_texts(request.input, dimensions)
+    return EmbeddingResponse(
+        embeddings=vectors.tolist(),
+        model=EMBEDDING_MODEL,
+        dimensions=dimensions,
+    )
+
+@router.websocket("/ws/chat")
+async def websocket_chat(
+    websocket: WebSocket,
+    model: ModelType = Query(ModelType.OPENAI),
+    session_id: Optional[str] = Query(None),
+    api_key_query: Optional[str] = Query(None, alias="api_key"),
+):
+    """
+    Chat por WebSocket com a conversa guardada no servidor.
+
+    Protocolo:
+        - servidor envia {"type": "session", "session_id": ...} ao conectar
+          (passe ?session_id=... para retomar uma sessão);
+        - cliente envia só a mensagem nova: {"content": "...", "role": "user"};
+        - servidor responde com vários {"type": "delta", "content": ...}
+          e um {"type": "done", ...} no final do turno.
+    """
+    api_key = websocket.headers.get("x-api-key") or api_key_query
+    if not api_key:
+        await websocket.close(code=1008, reason="API key obrigatória")
+        return
+
+    session = session_manager.get(session_id, api_key) if session_id else None
+    if session_id and session is None:
+        await websocket.close(code=1008, reason="Sessão não encontrada")
+        return
+    if session is None:
+        try:
+            session = session_manager.create(api_key, model)
+        except RuntimeError as e:
+            await websocket.close(code=1013, reason=str(e))
+            return
+
+    await websocket.accept()
+    await websocket.send_json({"type": "session", "session_id": session.session_id, "model": session.model.value})
+
+    # Os frames são lidos em paralelo ao turno: assim a desconexão é notada
+    # na hora e a chamada ao provedor em andamento é cancelada
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_INBOX_SIZE)
+    disconnected = asyncio.Event()
+    reader = asyncio.create_task(_read_ws_frames(websocket, inbox, disconnected))
+    loop = asyncio.get_running_loop()
+
+    try:
+        while not disconnected.is_set():
+            # Timer simples em vez de wait_for: sem task extra por conexão ociosa
+            idle_timer = loop.call_later(settings.WS_IDLE_TIMEOUT, _put_nowait, inbox, _WS_IDLE)
+            try:
+                frame = await inbox.get()
+            finally:
+                idle_timer.cancel()
+            if frame is _WS_IDLE:
+                await websocket.close(code=1000, reason="Sessão ociosa")
+                return
+            if frame is None:
+                break
+            try:
+                payload = json.loads(frame)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "error": "VALIDATION_ERROR", "message": f"JSON inválido: {e}"})
+                continue
+            await _handle_ws_turn(websocket, session, payload, disconnected)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+    logger.info(f"🔌 Sessão {session.session_id} desconectada ({len(session)} mensagens guardadas)")
+
+async def _read_ws_frames(websocket: WebSocket, inbox: asyncio.Queue, disconnected: asyncio.Event) -> None:
+    """
+    Lê os frames do cliente para a fila; marca `disconnected` quando ele sai.
+
+    Nunca espera por espaço na fila: com o turno em andamento e a fila cheia,
+    o frame é recusado com um erro e a leitura continua, senão a desconexão
+    só seria vista depois que o turno terminasse.
+    """
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = message.get("text")
+            if not _put_nowait(inbox, frame if frame is not None else message.get("bytes", b"")):
+                try:
+                    await websocket.send_json({
+                        "type": "error",
+                        "error": "SESSION_BUSY",
+                        "message": f"Mensagem descartada: já há {WS_INBOX_SIZE} aguardando o turno atual",
+                    })
+                except (WebSocketDisconnect, RuntimeError):
+                    return
+    finally:
+        disconnected.set()
+        _put_nowait(inbox, None)  # acorda o loop se ele estiver esperando frame
+
+def _put_nowait(inbox: asyncio.Queue, item) -> bool:
+    """Enfileira sem esperar; False se a fila estiver cheia."""
+    try:
+        inbox.put_nowait(item)
+        return True
+    except asyncio.QueueFull:
+        return False
+
+async def _handle_ws_turn(
+    websocket: WebSocket,
+    session: ChatSession,
+    payload,
+    disconnected: asyncio.Event,
+) -> None:
+    """Processa um turno: valida só a mensagem nova, gera e transmite a resposta."""
+    try:
+        if not isinstance(payload, dict):
+            raise ValueError("a mensagem deve ser um objeto JSON")
+        role = MessageRole(payload.get("role", MessageRole.USER.value))
+        if role not in (MessageRole.USER, MessageRole.SYSTEM):
+            raise ValueError("role deve ser 'user' ou 'system'")
+        message = ChatMessage(role=role, content=payload.get("content", ""))
+    except (AttributeError, ValueError) as e:
+        await websocket.send_json({"type": "error", "error": "VALIDATION_ERROR", "message": str(e)})
+        return
+
+    session.append(message.role, message.content, session_manager.max_messages)
+    if message.role == MessageRole.SYSTEM:
+        await websocket.send_json({"type": "done", "tokens_used": session.token_count})
+        return
+
+    async def is_disconnected() -> bool:
+        return disconnected.is_set()
+
+    deadline = Deadline.after(settings.CHAT_REQUEST_TIMEOUT)
+    try:
+        with deadline_scope(deadline):
+            response = await run_with_deadline(
+                asyncio.to_thread(ai_service.generate_response, session.to_request(), session.api_key),
+                deadline,
+                is_disconnected=is_disconnected,
+                poll_interval=settings.DISCONNECT_POLL_INTERVAL,
+            )
+    except RequestCancelledError:
+        # Cliente foi embora no meio do turno: não há para quem responder
+        session.pop()
+        return
+    except AIServiceError as e:
+        session.pop()
+        await websocket.send_json({"type": "error", "error": e.error_code, "message": e.message})
+        return
+
+    # Transmite a resposta em pedaços (o provedor ainda é simulado e devolve tudo de uma vez)
+    for word in response.response.split(" "):
+        await websocket.send_json({"type": "delta", "content": word + " "})
+    session.append(MessageRole.ASSISTANT, response.response, session_manager.max_messages)
+    await websocket.send_json({
+        "type": "done",
+        "tokens_used": response.tokens_used,
+        "processing_time": response.processing_time,
+        "messages": len(session),
+    })
+
 @router.get("/models/{model_name}")
 @timer
 async def get_model_info(model_name: str):
@@ -162,6 +338,36 @@ async def validate_api_key(api_key: str = Header(None, alias="X-API-Key")):
     except AIServiceError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
+@router.get("/usage")
+def get_usage(
+    group_by: str = Query("key,model", description="Agrupar por 'key', 'model' ou 'key,model'"),
+    api_key: str = Header(None, alias="X-API-Key"),
+    admin_token: str = Header(None, alias="X-Admin-Token"),
+):
+    """
+    Agregados de uso e custo por API key e/ou modelo.
+    É como o "extrato" da conta de IA: cada cliente só vê o próprio.
+
+    Com X-Admin-Token válido, mostra o uso de todas as API keys.
+    Rota síncrona de propósito: leitura de disco e pandas rodam no threadpool.
+    """
+    is_admin = bool(settings.ADMIN_TOKEN and admin_token) and hmac.compare_digest(
+        admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    )
+    if not is_admin and not api_key:
+        raise HTTPException(status_code=401, detail="API key obrigatória no header X-API-Key")
+
+    columns = [column.strip() for column in group_by.split(",") if column.strip()]
+    invalid = [column for column in columns if column not in GROUP_COLUMNS]
+    if not columns or invalid:
+        raise HTTPException(
+            status_code=422,
+            detail=f"group_by inválido: use {', '.join(GROUP_COLUMNS)}"
+        )
+
+    usage = usage_recorder.summary(group_by=columns, api_key=None if is_admin else api_key)
+    return format_response("Uso agregado", {"group_by": columns, "usage": usage})
+
 # ===== Exemplo de uso dos decorators =====
 @timer
 @cache_result(duration_seconds=30)
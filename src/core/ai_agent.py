@@ -0,0 +1,232 @@
+"""
+Runtime de agentes com execução de ferramentas.
+É como um "gerente de projeto": o modelo pede tarefas e o agente distribui todas ao mesmo tempo.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from config.settings import settings
+from src.core.ai_service import AIService
+from src.core.data_types import AgentResult, AIrequest, AIResponse, ChatMessage, MessageRole, ModelType, ToolCall
+from src.core.exception import AgentIterationLimitError
+from src.utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+LLMCallable = Callable[[AIrequest], Awaitable[AIResponse]]
+
+TOOL_RESULT_MAX_CHARS = 10000  # limite de ChatMessage.content
+
+
+class Tool:
+    """
+    Ferramenta que o modelo pode chamar.
+
+    Funções async rodam no event loop; funções comuns (bloqueantes) rodam
+    no pool de threads do agente. `idempotent=True` permite memoizar o
+    resultado por argumentos.
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        name: Optional[str] = None,
+        description: str = "",
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+    ):
+        self.func = func
+        self.name = name or func.__name__
+        self.description = description or (inspect.getdoc(func) or "").split("\n")[0]
+        self.timeout = timeout if timeout is not None else settings.AGENT_TOOL_TIMEOUT
+        self.idempotent = idempotent
+        self.is_async = inspect.iscoroutinefunction(func)
+
+
+def tool(
+    name: Optional[str] = None,
+    description: str = "",
+    timeout: Optional[float] = None,
+    idempotent: bool = False,
+):
+    """
+    Decorator que transforma uma função em ferramenta do agente.
+
+    Uso:
+        @tool(timeout=5.0, idempotent=True)
+        async def buscar_clima(cidade: str) -> str:
+            # código aqui
+    """
+    def decorator(func: Callable[..., Any]) -> Tool:
+        return Tool(func, name=name, description=description, timeout=timeout, idempotent=idempotent)
+    return decorator
+
+
+class AIAgent:
+    """
+    Loop do agente: chama o modelo, executa as ferramentas pedidas e devolve
+    os resultados ao modelo até ele responder sem pedir ferramentas.
+
+    Todas as chamadas de ferramenta de uma mesma resposta rodam em paralelo.
+    Resultados de ferramentas idempotentes são memorizados só durante um `run`.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[Tool] = (),
+        llm: Optional[LLMCallable] = None,
+        model: ModelType = ModelType.OPENAI,
+        api_key: str = "",
+        max_iterations: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        service: Optional[AIService] = None,
+    ):
+        self.tools: Dict[str, Tool] = {t.name: t for t in tools}
+        self.model = model
+        self.api_key = api_key
+        self.max_iterations = max_iterations or settings.AGENT_MAX_ITERATIONS
+        self.service = service
+        self.llm = llm or self._service_llm
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.AGENT_TOOL_WORKERS,
+            thread_name_prefix="agent-tool",
+        )
+
+    async def run(self, messages: List[ChatMessage]) -> AgentResult:
+        """
+        Executa o agente até a resposta final.
+
+        Args:
+            messages: Histórico inicial da conversa.
+
+        Returns:
+            Resposta final, histórico completo e estatísticas.
+
+        Raises:
+            AgentIterationLimitError: Se o modelo continuar pedindo ferramentas
+                depois de `max_iterations` chamadas.
+        """
+        history = list(messages)
+        executed = 0
+        memo: Dict[str, "asyncio.Future[Any]"] = {}
+
+        for iteration in range(1, self.max_iterations + 1):
+            response = await self.llm(AIrequest(model=self.model, messages=history))
+            if not response.tool_calls:
+                return AgentResult(
+                    response=response,
+                    messages=history,
+                    iterations=iteration,
+                    tool_calls_executed=executed,
+                )
+
+            # O pedido fica no histórico para as mensagens TOOL apontarem para ele
+            history.append(ChatMessage(
+                role=MessageRole.ASSISTANT,
+                content=response.response or "(chamando ferramentas)",
+                tool_calls=response.tool_calls,
+            ))
+            history.extend(await self.execute_tool_calls(response.tool_calls, memo))
+            executed += len(response.tool_calls)
+
+        raise AgentIterationLimitError(self.max_iterations)
+
+    async def execute_tool_calls(
+        self,
+        calls: Sequence[ToolCall],
+        memo: Optional[Dict[str, "asyncio.Future[Any]"]] = None,
+    ) -> List[ChatMessage]:
+        """
+        Executa as chamadas em paralelo; a ordem do resultado segue a ordem pedida.
+
+        Args:
+            calls: Chamadas pedidas pelo modelo.
+            memo: Resultados memorizados de ferramentas idempotentes. Sem ele,
+                a memorização vale só para estas chamadas.
+        """
+        memo = {} if memo is None else memo
+        started = time.perf_counter()
+        with span("tool_calls"):
+            results = await asyncio.gather(*(self._execute(call, memo) for call in calls))
+        logger.info(f"🛠️ {len(calls)} ferramentas executadas em {time.perf_counter() - started:.4f}s")
+        return list(results)
+
+    def close(self) -> None:
+        """Libera o pool de threads das ferramentas bloqueantes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _execute(self, call: ToolCall, memo: Dict[str, "asyncio.Future[Any]"]) -> ChatMessage:
+        """Executa uma chamada e converte o resultado (ou erro) em mensagem TOOL."""
+        selected = self.tools.get(call.name)
+        if selected is None:
+            return self._tool_message(call, f"Erro: ferramenta '{call.name}' não existe")
+
+        try:
+            result = await self._run_memoized(selected, call.arguments, memo)
+            content = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏰ Ferramenta {call.name} excedeu {selected.timeout}s")
+            return self._tool_message(call, f"Erro: ferramenta '{call.name}' excedeu o tempo limite")
+        except Exception as e:
+            logger.error(f"❌ Ferramenta {call.name} falhou: {e}")
+            return self._tool_message(call, f"Erro: {e}")
+        return self._tool_message(call, content)
+
+    async def _run_memoized(
+        self,
+        selected: Tool,
+        arguments: Dict[str, Any],
+        memo: Dict[str, "asyncio.Future[Any]"],
+    ) -> Any:
+        """
+        Executa a ferramenta; se for idempotente, chamadas com os mesmos
+        argumentos (inclusive simultâneas) compartilham uma única execução.
+        """
+        if not selected.idempotent:
+            return await self._run(selected, arguments)
+
+        key = selected.name + ":" + json.dumps(arguments, sort_keys=True, default=str)
+        future = memo.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(selected, arguments))
+            memo[key] = future
+            # Falhas não ficam memorizadas: a próxima chamada tenta de novo
+            future.add_done_callback(
+                lambda f: memo.pop(key, None) if f.cancelled() or f.exception() else None
+            )
+        else:
+            logger.info(f"📦 Resultado memorizado para {selected.name}")
+        return await asyncio.shield(future)
+
+    async def _run(self, selected: Tool, arguments: Dict[str, Any]) -> Any:
+        """Roda no event loop (async) ou no pool de threads (bloqueante), com timeout."""
+        if selected.is_async:
+            work = selected.func(**arguments)
+        else:
+            loop = asyncio.get_running_loop()
+            # Atenção: no timeout a thread não é interrompida, só abandonada
+            work = loop.run_in_executor(self._executor, functools.partial(selected.func, **arguments))
+        return await asyncio.wait_for(work, timeout=selected.timeout)
+
+    async def _service_llm(self, request: AIrequest) -> AIResponse:
+        """Modelo padrão: o AIService, fora do event loop."""
+        if self.service is None:
+            self.service = AIService()
+        return await asyncio.to_thread(self.service.generate_response, request, self.api_key)
+
+    @staticmethod
+    def _tool_message(call: ToolCall, content: str) -> ChatMessage:
+        """Mensagem TOOL que sempre passa na validação do ChatMessage (saída vazia ou só espaços vira "(vazio)")."""
+        content = str(content or "").strip() or "(vazio)"
+        return ChatMessage(
+            role=MessageRole.TOOL,
+            content=content[:TOOL_RESULT_MAX_CHARS],
+            tool_call_id=call.id,
+        )
@@ -5,12 +5,21 @@ Serviço de IA com decorators aplicados.
 
 import random
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+import numpy as np
+
 from src.utils.decorators import timer, retry, cache_result, validate_api_key_decorator, log_calls
 from src.utils.error_handler import InvalidAPIKeyError, ModelNotFoundError, TokenLimitExceededError, AIServiceError
-from src.core.data_types import AIrequest, AIResponse, ModelType
+from config.settings import settings
+from src.core.compaction import CompactionStrategy, build_strategy, count_tokens
+from src.core.data_types import AIrequest, AIResponse, ChatMessage, ModelType
+from src.core.embeddings import SemanticCache
+from src.core.usage import UsageRecorder, usage_recorder, MODEL_PRICING, DEFAULT_PRICING
+from src.utils.deadline import check_deadline, deadline_sleep
+from src.utils.helpers import calculate_tokens
+from src.utils.profiling import span
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +29,31 @@ class AIService:
     É como ter um "cérebro artificial" equipado com ferramentas avançadas.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        usage: Optional[UsageRecorder] = usage_recorder,
+        compaction: Optional[CompactionStrategy] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+    ):
+        self.usage = usage
         self.available_models = [model.value for model in ModelType]
         self.max_tokens_per_model = {
             ModelType.OPENAI: 8000,
             ModelType.GEMINI: 32000,
             ModelType.GROK: 100000
         }
+        self.compaction = compaction or build_strategy(
+            settings.COMPACTION_STRATEGY,
+            summarizer=self._summarize_messages,
+            summary_model=ModelType(settings.COMPACTION_SUMMARY_MODEL),
+            keep_turns=settings.COMPACTION_KEEP_TURNS,
+        )
+        if semantic_cache is None and settings.SEMANTIC_CACHE_ENABLED:
+            semantic_cache = SemanticCache(
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+        self.semantic_cache = semantic_cache
     
     @timer
     @retry(max_attempts=3, delay=1.0)
@@ -36,16 +63,45 @@ class AIService:
         Gera resposta usando IA.
         Tem superpoderes: cronômetro, retry automático e logging.
         """
-        self._validate_request(request, api_key)
+        start_time = time.perf_counter()
+        with span("compaction"):
+            request = self._compact_request(request)
+        with span("validation"):
+            self._validate_request(request, api_key)
         
-        # Simula processamento da IA (depois conectaremos com APIs reais)
-        response_text = self._mock_ai_response(request)
+        response_text = None
+        cached = False
+        if self.semantic_cache is not None:
+            # A pergunta vira vetor uma vez só, usado na busca e no armazenamento
+            cache_scope, cache_vector = self._semantic_cache_key(request, api_key)
+            response_text = self.semantic_cache.lookup(cache_scope, cache_vector)
+            cached = response_text is not None
+
+        if response_text is None:
+            check_deadline()
+            # Simula processamento da IA (depois conectaremos com APIs reais)
+            with span("provider_call"):
+                response_text = self._mock_ai_response(request)
+            if self.semantic_cache is not None:
+                self.semantic_cache.store(cache_scope, cache_vector, response_text)
+        input_tokens = self._calculate_tokens(request)
+        processing_time = time.perf_counter() - start_time
+
+        if self.usage is not None:
+            self.usage.record(
+                api_key,
+                request.model,
+                input_tokens,
+                calculate_tokens(response_text),
+                processing_time,
+                cached=cached,
+            )
         
         return AIResponse(
             response=response_text,
             model_used=request.model.value,
-            tokens_used=self._calculate_tokens(request),
-            processing_time=random.uniform(0.5, 2.0)
+            tokens_used=input_tokens,
+            processing_time=processing_time
         )
     
     @cache_result(duration_seconds=60)
@@ -100,10 +156,56 @@ class AIService:
         if total_tokens > max_tokens:
             raise TokenLimitExceededError(total_tokens, max_tokens)
     
+    def _compact_request(self, request: AIrequest) -> AIrequest:
+        """
+        Compacta o histórico quando ele passa do limite do modelo.
+        Se a compactação estiver desligada, a requisição segue intacta
+        e `_validate_request` decide se estoura o limite.
+        """
+        max_tokens = self.max_tokens_per_model.get(request.model, 4000)
+        total_tokens = self._calculate_tokens(request)
+        if self.compaction is None or total_tokens <= max_tokens:
+            return request
+
+        budget = int(max_tokens * settings.COMPACTION_TARGET_RATIO)
+        messages = self.compaction.compact(request.messages, budget)
+        logger.info(
+            f"🗜️ Contexto compactado ({self.compaction.name}): "
+            f"{len(request.messages)} → {len(messages)} mensagens, "
+            f"{total_tokens} → {count_tokens(messages)} tokens"
+        )
+        return request.model_copy(update={"messages": messages})
+
+    def _summarize_messages(self, messages: List[ChatMessage], model: ModelType) -> str:
+        """
+        Resume mensagens antigas usando um modelo mais barato.
+        Simulado: resumo extrativo com o início de cada mensagem
+        (depois conectaremos com APIs reais).
+        """
+        logger.info(f"📝 Resumindo {len(messages)} mensagens com {model.value}")
+        with span("summarization"):
+            return " | ".join(
+                f"{msg.role.value}: {msg.content[:200]}" for msg in messages
+            )
+
+    def _semantic_cache_key(self, request: AIrequest, api_key: str) -> Tuple[int, np.ndarray]:
+        """
+        Chave do cache semântico: escopo exato (API key, modelo, temperature,
+        max_tokens e todo o contexto anterior) + embedding só da última mensagem.
+        Assim históricos longos quase iguais não escondem perguntas diferentes.
+        """
+        *context, question = request.messages
+        context_text = "\n".join(f"{msg.role.value}: {msg.content}" for msg in context)
+        scope = self.semantic_cache.scope(
+            api_key, request.model.value, context_text, request.temperature, request.max_tokens
+        )
+        return scope, self.semantic_cache.embed(question.content)
+
     def _calculate_tokens(self, request: AIrequest) -> int:
         """Calcula tokens da requisição"""
-        total_chars = sum(len(msg.content) for msg in request.messages)
-        return total_chars // 4  # Estimativa: 4 chars por token
+        with span("token_counting"):
+            total_chars = sum(len(msg.content) for msg in request.messages)
+            return total_chars // 4  # Estimativa: 4 chars por token
     
     def _mock_ai_response(self, request: AIrequest) -> str:
         """Simula resposta da IA"""
@@ -114,18 +216,11 @@ class AIService:
             "Essa é uma pergunta interessante! Deixe-me quebrar isso em partes..."
         ]
         
-        # Simula tempo de processamento
-        time.sleep(random.uniform(0.5, 1.5))
+        # Simula tempo de processamento (interrompido se a requisição for cancelada)
+        deadline_sleep(random.uniform(0.5, 1.5))
         
         return random.choice(responses)
     
     def _get_pricing(self, model_name: str) -> Dict[str, float]:
-        """Retorna preços simulados"""
-        pricing = {
-            ModelType.GPT_3_5: {"input": 0.0015, "output": 0.002},
-            ModelType.GPT_4: {"input": 0.03, "output": 0.06},
-            ModelType.CLAUDE: {"input": 0.008, "output": 0.024},
-            ModelType.GEMINI: {"input": 0.00025, "output": 0.0005}
-        }
-        
-        return pricing.get(ModelType(model_name), {"input": 0.001, "output": 0.002})
+        """Retorna preços simulados (por 1K tokens)"""
+        return MODEL_PRICING.get(ModelType(model_name), DEFAULT_PRICING)
@@ -0,0 +1,308 @@
+"""
+Processamento offline de arquivos JSONL de requisições.
+É como uma "linha de produção": lê, processa e grava sem passar pelo servidor HTTP.
+
+Uso:
+    python -m src.core.bulk_runner entrada.jsonl saida.jsonl --api-key sk-... --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.core.ai_service import AIService
+from src.core.data_types import AIrequest
+
+logger = logging.getLogger(__name__)
+
+ParsedLine = Tuple[Optional[AIrequest], Optional[Any], Optional[str]]
+
+
+def parse_lines(lines: List[bytes]) -> List[ParsedLine]:
+    """
+    Valida um bloco de linhas JSONL como AIrequest.
+
+    Returns:
+        Lista de (requisição, id opcional da linha, erro).
+    """
+    parsed: List[ParsedLine] = []
+    for line in lines:
+        try:
+            data = json.loads(line)
+            parsed.append((AIrequest.model_validate(data), data.get("id"), None))
+        except (ValueError, ValidationError) as e:
+            parsed.append((None, None, f"Linha inválida: {e}"))
+    return parsed
+
+
+class Checkpoint:
+    """Posição já processada do arquivo, gravada de forma atômica."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lines_done = 0     # registros (linhas não vazias) já gravados na saída
+        self.input_lines = 0    # linhas do arquivo de entrada já consumidas, contando as vazias
+        self.input_offset = 0
+        self.output_offset = 0
+
+    def load(self, input_path: str) -> bool:
+        """Carrega o checkpoint se ele existir e for do mesmo arquivo de entrada."""
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("input") != os.path.abspath(input_path):
+            raise ValueError(f"Checkpoint {self.path} pertence a outro arquivo: {data.get('input')}")
+
+        self.lines_done = data["lines_done"]
+        self.input_lines = data.get("input_lines", self.lines_done)
+        self.input_offset = data["input_offset"]
+        self.output_offset = data["output_offset"]
+        return True
+
+    def save(self, input_path: str) -> None:
+        """Grava em arquivo temporário e troca de nome (sem checkpoint pela metade)."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "lines_done": self.lines_done,
+                "input_lines": self.input_lines,
+                "input_offset": self.input_offset,
+                "output_offset": self.output_offset,
+                "updated_at": time.time(),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+
+class BulkRunner:
+    """
+    Executa um JSONL de AIrequest direto no AIService.
+
+    - Concorrência limitada: até `concurrency` chamadas simultâneas em threads.
+    - A validação roda no próprio processo: devolver AIrequest prontas de
+      outros processos custa mais (unpickle) do que validar aqui.
+    - A saída é gravada na ordem da entrada, incrementalmente; o checkpoint
+      guarda os offsets de entrada e saída, então uma execução interrompida
+      continua exatamente de onde parou.
+    """
+
+    def __init__(
+        self,
+        service: AIService,
+        api_key: str,
+        concurrency: int = 16,
+        chunk_size: int = 256,
+        checkpoint_every: int = 1000,
+        progress_interval: float = 10.0,
+    ):
+        self.service = service
+        self.api_key = api_key
+        self.concurrency = max(concurrency, 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.checkpoint_every = max(checkpoint_every, 1)
+        self.progress_interval = progress_interval
+
+    async def run(self, input_path: str, output_path: str, checkpoint_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Processa o arquivo inteiro (ou o que falta dele).
+
+        Returns:
+            Estatísticas da execução.
+        """
+        checkpoint = Checkpoint(checkpoint_path or output_path + ".checkpoint")
+        if checkpoint.load(input_path):
+            logger.info(f"♻️ Retomando a partir da linha {checkpoint.lines_done}")
+
+        input_size = os.path.getsize(input_path)
+        stats = {"processed": 0, "errors": 0, "resumed_from": checkpoint.lines_done}
+
+        thread_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bulk")
+        window = asyncio.Semaphore(self.concurrency * 2)
+
+        output = open(output_path, "ab")
+        output.truncate(checkpoint.output_offset)
+        output.seek(checkpoint.output_offset)
+
+        # Reordenação: resultados chegam fora de ordem, mas são gravados em ordem
+        pending: Dict[int, Tuple[bytes, int, int]] = {}
+        next_to_write = checkpoint.lines_done
+
+        # O uso fica num ring buffer: grava antes de dar a volta, não só no fim
+        usage = self.service.usage
+        usage_every = max(usage.capacity // 2, 1) if usage is not None else 0
+        progress = _Progress(input_size, checkpoint.input_offset, checkpoint.lines_done, self.progress_interval)
+
+        def write_ready() -> None:
+            nonlocal next_to_write
+            while next_to_write in pending:
+                payload, end_offset, line_number = pending.pop(next_to_write)
+                output.write(payload)
+                checkpoint.lines_done = next_to_write + 1
+                checkpoint.input_lines = line_number
+                checkpoint.input_offset = end_offset
+                checkpoint.output_offset += len(payload)
+                next_to_write += 1
+                window.release()
+
+                if checkpoint.lines_done % self.checkpoint_every == 0:
+                    self._save_checkpoint(output, checkpoint, input_path)
+                elif usage_every and checkpoint.lines_done % usage_every == 0:
+                    self._flush_usage()
+                progress.update(checkpoint.lines_done, checkpoint.input_offset)
+
+        async def process(index: int, item: ParsedLine, end_offset: int, line_number: int) -> None:
+            request, line_id, error = item
+            # "line" é o número real da linha no arquivo de entrada (1 = primeira)
+            record: Dict[str, Any] = {"line": line_number, "id": line_id}
+            if request is None:
+                record["error"] = error
+            else:
+                try:
+                    response = await loop.run_in_executor(
+                        thread_pool, self.service.generate_response, request, self.api_key
+                    )
+                    record["response"] = response.model_dump(mode="json")
+                except Exception as e:
+                    record["error"] = str(e)
+
+            stats["processed"] += 1
+            if "error" in record:
+                stats["errors"] += 1
+            pending[index] = ((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"), end_offset, line_number)
+            write_ready()
+
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        try:
+            with open(input_path, "rb") as source:
+                source.seek(checkpoint.input_offset)
+                index = checkpoint.lines_done
+
+                for chunk in self._read_chunks(source, checkpoint.input_offset, checkpoint.input_lines):
+                    parsed = parse_lines([line for line, _, _ in chunk])
+                    for (_, end_offset, line_number), item in zip(chunk, parsed):
+                        await window.acquire()
+                        task = asyncio.create_task(process(index, item, end_offset, line_number))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                        index += 1
+
+            if tasks:
+                await asyncio.gather(*tasks)
+            self._save_checkpoint(output, checkpoint, input_path)
+        finally:
+            output.close()
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._flush_usage()
+
+        stats["lines_done"] = checkpoint.lines_done
+        stats["elapsed"] = round(progress.elapsed, 3)
+        stats["lines_per_second"] = round(stats["processed"] / max(progress.elapsed, 1e-9), 2)
+        logger.info(f"✅ Processamento concluído: {stats}")
+        return stats
+
+    def _read_chunks(self, source, offset: int, line_number: int):
+        """Lê blocos de linhas não vazias com o offset final e o número (real) de cada uma."""
+        chunk: List[Tuple[bytes, int, int]] = []
+        for line in source:
+            offset += len(line)
+            line_number += 1
+            if not line.strip():
+                continue
+            chunk.append((line, offset, line_number))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _save_checkpoint(self, output, checkpoint: Checkpoint, input_path: str) -> None:
+        """Garante a saída (e o uso registrado) no disco antes de avançar o checkpoint."""
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint.save(input_path)
+        self._flush_usage()
+
+    def _flush_usage(self) -> None:
+        """Grava o uso pendente do AIService antes que o ring buffer o sobrescreva."""
+        if self.service.usage is not None:
+            self.service.usage.flush()
+
+
+class _Progress:
+    """Calcula vazão e ETA pelo avanço em bytes do arquivo de entrada."""
+
+    def __init__(self, total_bytes: int, start_offset: int, start_lines: int, interval: float):
+        self.total_bytes = total_bytes
+        self.start_offset = start_offset
+        self.start_lines = start_lines
+        self.interval = interval
+        self.started_at = time.perf_counter()
+        self.last_report = self.started_at
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def update(self, lines_done: int, offset: int) -> None:
+        now = time.perf_counter()
+        if now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = now - self.started_at
+        lines_rate = (lines_done - self.start_lines) / elapsed
+        bytes_rate = (offset - self.start_offset) / elapsed
+        remaining = self.total_bytes - offset
+        eta = remaining / bytes_rate if bytes_rate > 0 else float("inf")
+        percent = 100 * offset / self.total_bytes if self.total_bytes else 100.0
+        logger.info(
+            f"📊 {lines_done} linhas ({percent:.1f}%) | {lines_rate:.1f} linhas/s | ETA {eta:.0f}s"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Processa um JSONL de AIrequest direto no AIService")
+    parser.add_argument("input", help="Arquivo JSONL de entrada (uma AIrequest por linha)")
+    parser.add_argument("output", help="Arquivo JSONL de saída (gravado incrementalmente)")
+    parser.add_argument("--api-key", default=os.getenv("BULK_API_KEY", ""), help="API key usada nas requisições")
+    parser.add_argument("--checkpoint", default=None, help="Arquivo de checkpoint (padrão: <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requisições simultâneas")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Linhas por bloco de leitura")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Linhas entre checkpoints")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Segundos entre relatórios de progresso")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("informe --api-key ou a variável BULK_API_KEY")
+
+    # Logs por requisição do AIService ficariam enormes em arquivos grandes
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    runner = BulkRunner(
+        AIService(),
+        api_key=args.api_key,
+        concurrency=args.concurrency,
+        chunk_size=args.chunk_size,
+        checkpoint_every=args.checkpoint_every,
+        progress_interval=args.progress_interval,
+    )
+    stats = asyncio.run(runner.run(args.input, args.output, args.checkpoint))
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Compactação automática de contexto.
+É como "resumir a ata da reunião" quando a conversa fica longa demais para o modelo.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from src.core.data_types import ChatMessage, MessageRole, ModelType
+from src.utils.helpers import calculate_tokens
+from src.utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+Summarizer = Callable[[List[ChatMessage], ModelType], str]
+
+SUMMARY_PREFIX = "Resumo da conversa anterior: "
+SUMMARY_MAX_CHARS = 8000  # ChatMessage aceita até 10000 caracteres
+
+
+def count_tokens(messages: List[ChatMessage]) -> int:
+    """Estima os tokens de uma lista de mensagens."""
+    return sum(calculate_tokens(msg.content) for msg in messages)
+
+
+def split_turns(messages: List[ChatMessage]) -> List[List[ChatMessage]]:
+    """
+    Agrupa mensagens em turnos: cada turno começa numa mensagem do usuário
+    e inclui as respostas (assistente/ferramenta) que vêm depois dela.
+    """
+    turns: List[List[ChatMessage]] = []
+    for msg in messages:
+        if msg.role == MessageRole.USER or not turns:
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return turns
+
+
+class CompactionStrategy:
+    """Estratégia base: recebe mensagens e devolve uma versão que cabe no orçamento."""
+
+    name = "base"
+
+    def compact(self, messages: List[ChatMessage], max_tokens: int) -> List[ChatMessage]:
+        raise NotImplementedError
+
+
+class SlidingWindowStrategy(CompactionStrategy):
+    """Mantém as mensagens mais recentes que couberem no orçamento de tokens."""
+
+    name = "sliding_window"
+
+    def compact(self, messages: List[ChatMessage], max_tokens: int) -> List[ChatMessage]:
+        kept: List[ChatMessage] = []
+        used = 0
+        for msg in reversed(messages):
+            tokens = calculate_tokens(msg.content)
+            if kept and used + tokens > max_tokens:
+                break
+            kept.append(msg)
+            used += tokens
+        return list(reversed(kept))
+
+
+class KeepLastTurnsStrategy(CompactionStrategy):
+    """Mantém as mensagens de sistema e os últimos K turnos da conversa."""
+
+    name = "keep_last_turns"
+
+    def __init__(self, keep_turns: int = 4):
+        self.keep_turns = max(keep_turns, 1)
+
+    def compact(self, messages: List[ChatMessage], max_tokens: int) -> List[ChatMessage]:
+        system = [msg for msg in messages if msg.role == MessageRole.SYSTEM]
+        conversation = [msg for msg in messages if msg.role != MessageRole.SYSTEM]
+        recent = [msg for turn in split_turns(conversation)[-self.keep_turns:] for msg in turn]
+
+        compacted = system + recent
+        if count_tokens(compacted) > max_tokens:
+            # Ainda grande demais: desliza a janela só sobre os turnos recentes
+            budget = max(max_tokens - count_tokens(system), 0)
+            compacted = system + SlidingWindowStrategy().compact(recent, budget)
+        return compacted
+
+
+class SummarizeStrategy(CompactionStrategy):
+    """
+    Resume os turnos antigos com um modelo mais barato e mantém os últimos K turnos.
+    Resumos ficam em cache por prefixo da conversa, então cada prefixo é resumido uma vez só.
+    """
+
+    name = "summarize"
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        summary_model: ModelType = ModelType.GEMINI,
+        keep_turns: int = 4,
+        cache_size: int = 1024,
+    ):
+        self.summarizer = summarizer
+        self.summary_model = summary_model
+        self.keep_turns = max(keep_turns, 1)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, messages: List[ChatMessage], max_tokens: int) -> List[ChatMessage]:
+        system = [msg for msg in messages if msg.role == MessageRole.SYSTEM]
+        turns = split_turns([msg for msg in messages if msg.role != MessageRole.SYSTEM])
+
+        older = [msg for turn in turns[:-self.keep_turns] for msg in turn]
+        recent = [msg for turn in turns[-self.keep_turns:] for msg in turn]
+        if not older:
+            return KeepLastTurnsStrategy(self.keep_turns).compact(messages, max_tokens)
+
+        summary = ChatMessage(
+            role=MessageRole.SYSTEM,
+            content=SUMMARY_PREFIX + self._summary_for(older)[:SUMMARY_MAX_CHARS],
+        )
+        compacted = system + [summary] + recent
+        if count_tokens(compacted) > max_tokens:
+            budget = max(max_tokens - count_tokens(system) - calculate_tokens(summary.content), 0)
+            compacted = system + [summary] + SlidingWindowStrategy().compact(recent, budget)
+        return compacted
+
+    def _summary_for(self, prefix: List[ChatMessage]) -> str:
+        """
+        Busca o resumo do prefixo no cache ou gera um novo.
+        Se um prefixo menor já foi resumido, só as mensagens novas são
+        resumidas junto com o resumo anterior (resumo incremental).
+        """
+        keys = self._prefix_keys(prefix)
+        with span("cache_lookup"), self._lock:
+            if keys[-1] in self._cache:
+                self._cache.move_to_end(keys[-1])
+                logger.info("📦 Cache hit para resumo de conversa")
+                return self._cache[keys[-1]]
+
+            to_summarize = prefix
+            for size in range(len(keys) - 1, 0, -1):
+                previous = self._cache.get(keys[size - 1])
+                if previous is not None:
+                    to_summarize = [
+                        ChatMessage(role=MessageRole.SYSTEM, content=SUMMARY_PREFIX + previous[:SUMMARY_MAX_CHARS])
+                    ] + prefix[size:]
+                    break
+
+        summary = self.summarizer(to_summarize, self.summary_model)
+
+        with self._lock:
+            self._cache[keys[-1]] = summary
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        logger.info(f"💾 Resumo de {len(prefix)} mensagens salvo no cache")
+        return summary
+
+    def _prefix_keys(self, prefix: List[ChatMessage]) -> List[str]:
+        """Gera uma chave estável para cada prefixo (1..N mensagens) da conversa."""
+        digest = hashlib.sha256(self.summary_model.value.encode())
+        keys = []
+        for msg in prefix:
+            digest.update(msg.role.value.encode())
+            digest.update(b"\x00")
+            digest.update(msg.content.encode())
+            digest.update(b"\x01")
+            keys.append(digest.copy().hexdigest())
+        return keys
+
+
+def build_strategy(
+    name: str,
+    summarizer: Optional[Summarizer] = None,
+    summary_model: ModelType = ModelType.GEMINI,
+    keep_turns: int = 4,
+) -> Optional[CompactionStrategy]:
+    """
+    Cria a estratégia de compactação pelo nome.
+
+    Args:
+        name: "none", "sliding_window", "keep_last_turns" ou "summarize".
+        summarizer: Função de resumo (obrigatória para "summarize").
+        summary_model: Modelo usado para resumir.
+        keep_turns: Quantos turnos recentes preservar.
+
+    Returns:
+        Estratégia configurada, ou None se a compactação estiver desligada.
+    """
+    if name == "none":
+        return None
+    if name == SlidingWindowStrategy.name:
+        return SlidingWindowStrategy()
+    if name == KeepLastTurnsStrategy.name:
+        return KeepLastTurnsStrategy(keep_turns)
+    if name == SummarizeStrategy.name:
+        if summarizer is None:
+            raise ValueError("Estratégia 'summarize' precisa de uma função de resumo")
+        return SummarizeStrategy(summarizer, summary_model, keep_turns)
+    raise ValueError(f"Estratégia de compactação desconhecida: '{name}'")
@@ -1,5 +1,5 @@
 #tipos de dados e modelos de para IA
-from typing import List, Annotated, Optional, Union, Any
+from typing import List, Annotated, Optional, Union, Any, Dict
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from enum import Enum
@@ -17,11 +17,19 @@ class MessageRole(str, Enum):
     ASSISTANT = "assistant"
     TOOL = "tool"
 
+class ToolCall(BaseModel):
+    """Chamada de ferramenta pedida pelo modelo"""
+    id: str
+    name: str
+    arguments: Dict[str, Any] = Field(default_factory=dict)
+
 class ChatMessage(BaseModel):
     """Modelo de mensagem voltado pra chat"""
     role: MessageRole
     content: str = Field(..., min_length=1, max_length=10000)
     timestamp: datetime = Field(default_factory=datetime.now)
+    tool_call_id: Optional[str] = None  # só para mensagens com role TOOL
+    tool_calls: List[ToolCall] = Field(default_factory=list)  # ferramentas pedidas pelo ASSISTANT
 
     @field_validator('content')
     def validate_content(cls, v):
@@ -59,4 +67,23 @@ class AIResponse(BaseModel):
     tokens_used: int
     processing_time: float
     timestamp: datetime = Field(default_factory=datetime.now)
+    tool_calls: List[ToolCall] = Field(default_factory=list)
+
+class AgentResult(BaseModel):
+    """Resultado de uma execução completa do agente"""
+    response: AIResponse
+    messages: List[ChatMessage]
+    iterations: int
+    tool_calls_executed: int
 
+class EmbeddingRequest(BaseModel):
+    """Modelo de requisicao de embeddings"""
+    input: List[Annotated[str, Field(min_length=1, max_length=10000)]] = Field(..., min_length=1, max_length=256)
+    dimensions: Optional[int] = Field(None, ge=8, le=4096)
+
+class EmbeddingResponse(BaseModel):
+    """Modelo de resposta de embeddings"""
+    embeddings: List[List[float]]
+    model: str
+    dimensions: int
+    timestamp: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,376 @@
+"""
+Embeddings locais e índice vetorial em NumPy.
+É como uma "biblioteca com fichário": cada texto vira um vetor e achamos os parecidos rapidinho.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from src.utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "local-hash"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def embed_text(text: str, dim: int = settings.EMBEDDING_DIM) -> np.ndarray:
+    """
+    Gera um embedding determinístico (feature hashing de palavras e trigramas).
+
+    Não depende de modelo nem de rede: o mesmo texto gera sempre o mesmo
+    vetor, o que permite testar busca e cache semântico offline.
+
+    Args:
+        text: Texto de entrada.
+        dim: Dimensão do vetor.
+
+    Returns:
+        Vetor float32 normalizado (norma L2 = 1, ou zeros para texto vazio).
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD_RE.findall(text.lower()):
+        _add_feature(vector, word, 1.0)
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            _add_feature(vector, padded[i:i + 3], 0.5)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def embed_texts(texts: Sequence[str], dim: int = settings.EMBEDDING_DIM) -> np.ndarray:
+    """Gera embeddings para vários textos (matriz float32 N x dim)."""
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.stack([embed_text(text, dim) for text in texts])
+
+
+def _add_feature(vector: np.ndarray, feature: str, weight: float) -> None:
+    """Soma o peso da feature na posição (e sinal) dada pelo hash."""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    sign = 1.0 if digest >> 63 else -1.0
+    vector[digest % len(vector)] += sign * weight
+
+
+class VectorIndex:
+    """
+    Índice vetorial por similaridade de cosseno (produto interno de vetores normalizados).
+
+    Modos:
+        - "flat": busca exata, multiplicação de matriz float32 contra todos os vetores.
+        - "ivf": aproximado; vetores agrupados por k-means e quantizados em int8.
+          A busca só olha os `nprobe` grupos mais próximos da consulta.
+
+    Índices salvos com `save` podem ser abertos com `load(..., mmap=True)`:
+    os arrays ficam mapeados em memória e vários workers compartilham as
+    mesmas páginas sem copiar nada.
+    """
+
+    def __init__(self, dim: int = settings.EMBEDDING_DIM):
+        self.dim = dim
+        self.mode = "flat"
+        self.size = 0
+        self.nprobe = settings.VECTOR_INDEX_NPROBE
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        # Modo IVF
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._codes = np.zeros((0, dim), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, vectors: np.ndarray, ids: Sequence[int]) -> None:
+        """Adiciona vetores ao índice."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Esperado {len(ids)} vetores de dimensão {self.dim}, recebido {vectors.shape}")
+
+        with self._lock:
+            self._make_writable()
+            start, end = self.size, self.size + len(ids)
+            self._reserve(end)
+            self._ids[start:end] = ids
+            if self.mode == "ivf":
+                codes, scales = _quantize(vectors)
+                self._codes[start:end] = codes
+                self._scales[start:end] = scales
+                self._assignments[start:end] = np.argmax(vectors @ self._centroids.T, axis=1)
+            else:
+                self._vectors[start:end] = vectors
+            self.size = end
+
+    def search(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os k vizinhos mais próximos.
+
+        Args:
+            queries: Vetor (dim,) ou matriz (N, dim) de consultas normalizadas.
+            k: Quantidade de resultados por consulta.
+
+        Returns:
+            (scores, ids), ambos (N, k). Posições vazias têm id -1 e score -inf.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if self.size == 0:
+            return scores, ids
+
+        for row, query in enumerate(queries):
+            if self.mode == "ivf":
+                candidates, candidate_scores = self._ivf_scores(query)
+            else:
+                candidates = None
+                candidate_scores = self._vectors[:self.size] @ query
+
+            top = _top_k(candidate_scores, k)
+            positions = top if candidates is None else candidates[top]
+            scores[row, :len(top)] = candidate_scores[top]
+            ids[row, :len(top)] = self._ids[positions]
+        return scores, ids
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Converte o índice flat em IVF quantizado (k-means + int8).
+        Os vetores float32 são descartados: o índice passa a ocupar ~4x menos memória.
+        """
+        with self._lock:
+            if self.mode == "ivf" or self.size == 0:
+                return
+
+            vectors = np.asarray(self._vectors[:self.size])
+            nlist = nlist or max(int(np.sqrt(self.size)), 1)
+            self._centroids = _kmeans(vectors, nlist, iterations, seed)
+            self._assignments = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+            self._codes, self._scales = _quantize(vectors)
+            self._ids = np.array(self._ids[:self.size])
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self.mode = "ivf"
+            logger.info(f"🗂️ Índice IVF construído: {self.size} vetores em {nlist} listas")
+
+    def save(self, path: str) -> None:
+        """Salva o índice num diretório de arquivos .npy (abríveis com mmap)."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {"ids": self._ids[:self.size]}
+        if self.mode == "ivf":
+            arrays.update(
+                centroids=self._centroids,
+                assignments=self._assignments[:self.size],
+                codes=self._codes[:self.size],
+                scales=self._scales[:self.size],
+            )
+        else:
+            arrays["vectors"] = self._vectors[:self.size]
+
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "mode": self.mode, "size": self.size, "nprobe": self.nprobe}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorIndex":
+        """Carrega um índice salvo; com `mmap=True` os arrays não são copiados para a memória."""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        index = cls(dim=meta["dim"])
+        index.mode = meta["mode"]
+        index.size = meta["size"]
+        index.nprobe = meta.get("nprobe", index.nprobe)
+        mmap_mode = "r" if mmap else None
+
+        def read(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        index._ids = read("ids")
+        if index.mode == "ivf":
+            index._centroids = read("centroids")
+            index._assignments = read("assignments")
+            index._codes = read("codes")
+            index._scales = read("scales")
+        else:
+            index._vectors = read("vectors")
+        return index
+
+    def _ivf_scores(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pontua só os vetores das `nprobe` listas mais próximas da consulta."""
+        probe = _top_k(self._centroids @ query, min(self.nprobe, len(self._centroids)))
+        candidates = np.flatnonzero(np.isin(self._assignments[:self.size], probe))
+        codes = self._codes[candidates].astype(np.float32)
+        return candidates, (codes @ query) * self._scales[candidates]
+
+    def _reserve(self, needed: int) -> None:
+        """Garante capacidade para `needed` vetores (crescimento por dobra)."""
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 16)
+        self._ids = _grow(self._ids, new_capacity)
+        if self.mode == "ivf":
+            self._codes = _grow(self._codes, new_capacity)
+            self._scales = _grow(self._scales, new_capacity)
+            self._assignments = _grow(self._assignments, new_capacity)
+        else:
+            self._vectors = _grow(self._vectors, new_capacity)
+
+    def _make_writable(self) -> None:
+        """Índices carregados com mmap são só leitura: copia antes da primeira escrita."""
+        for name in ("_ids", "_vectors", "_codes", "_scales", "_assignments", "_centroids"):
+            array = getattr(self, name)
+            if isinstance(array, np.memmap) or not array.flags.writeable:
+                setattr(self, name, np.array(array))
+
+
+class SemanticCache:
+    """
+    Reaproveita respostas de perguntas quase iguais.
+
+    Cada entrada pertence a um escopo exato (API key, modelo, parâmetros de
+    geração e hash do contexto anterior à pergunta): só a pergunta nova é
+    comparada por similaridade, e nunca entre clientes ou conversas diferentes.
+    As entradas ficam num buffer circular; as mais antigas são
+    sobrescritas ao encher.
+
+    O `embedder` é plugável. O padrão (`embed_text`) é lexical: "soma dos
+    pares" e "soma dos ímpares" ficam acima de 0.97, então com ele o limiar
+    deve ser quase exato (o padrão de SEMANTIC_CACHE_THRESHOLD é 0.9999, que
+    só junta variações de maiúsculas, pontuação e espaços). Limiares menores
+    só fazem sentido com um modelo de embedding semântico de verdade.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9999,
+        max_entries: int = 10000,
+        dim: int = settings.EMBEDDING_DIM,
+        embedder: Optional[Callable[[str], np.ndarray]] = None,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.embedder = embedder or functools.partial(embed_text, dim=dim)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._scopes = np.zeros(max_entries, dtype=np.uint64)
+        self._responses: List[Any] = [None] * max_entries
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._next_slot, self.max_entries)
+
+    @staticmethod
+    def scope(
+        api_key: str,
+        model: str,
+        context: str,
+        temperature: float,
+        max_tokens: Optional[int],
+    ) -> int:
+        """Hash exato do escopo de uma entrada (cliente, modelo, parâmetros de geração e contexto anterior)."""
+        digest = hashlib.blake2b(digest_size=8)
+        for part in (api_key, model, repr(float(temperature)), repr(max_tokens), context):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return int.from_bytes(digest.digest(), "little")
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding da pergunta; calcule uma vez e passe para `lookup` e `store`."""
+        with span("cache_embedding"):
+            return np.asarray(self.embedder(text), dtype=np.float32)
+
+    def lookup(self, scope: int, vector: np.ndarray) -> Optional[Any]:
+        """Retorna a resposta mais parecida do mesmo escopo, se passar do limiar."""
+        with span("cache_lookup"):
+            with self._lock:
+                candidates = np.flatnonzero(self._scopes[:len(self)] == np.uint64(scope))
+                if candidates.size == 0:
+                    return None
+                scores = self._vectors[candidates] @ vector
+                best = int(np.argmax(scores))
+                score = float(scores[best])
+                response = self._responses[candidates[best]]
+
+        if score >= self.threshold:
+            logger.info(f"📦 Cache semântico hit (similaridade {score:.3f})")
+            return response
+        return None
+
+    def store(self, scope: int, vector: np.ndarray, response: Any) -> None:
+        """Guarda a resposta associada à pergunta (já convertida em vetor) no escopo."""
+        with self._lock:
+            slot = self._next_slot % self.max_entries
+            self._vectors[slot] = vector
+            self._scopes[slot] = np.uint64(scope)
+            self._responses[slot] = response
+            self._next_slot += 1
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Posições dos k maiores scores, em ordem decrescente."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantização escalar int8 por vetor: v ≈ codes * scale."""
+    max_abs = np.abs(vectors).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int, seed: int) -> np.ndarray:
+    """K-means esférico simples (centróides normalizados) em NumPy."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+        sums[empty] = centroids[empty]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    """Realoca o array com nova capacidade, preservando o conteúdo."""
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def build_index(vectors: np.ndarray, ids: Sequence[int], dim: int = settings.EMBEDDING_DIM) -> VectorIndex:
+    """
+    Cria um índice escolhendo o modo pelo tamanho do corpus:
+    flat até VECTOR_INDEX_IVF_THRESHOLD vetores, IVF quantizado acima disso.
+    """
+    index = VectorIndex(dim)
+    index.add(vectors, ids)
+    if len(index) >= settings.VECTOR_INDEX_IVF_THRESHOLD:
+        index.build_ivf()
+    return index
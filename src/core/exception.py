@@ -25,4 +25,20 @@ class TokenLimitExceededError(AIServiceError):
 class RateLimitError(AIServiceError):
     """Erro quando ultrapassa limite de requisições"""
     def __init__(self, message: str = "Limite de requisições ultrapassado"):
-        super().__init__(message, "RATE_LIMIT_EXCEEDED")
\ No newline at end of file
+        super().__init__(message, "RATE_LIMIT_EXCEEDED")
+
+class AgentIterationLimitError(AIServiceError):
+    """Erro quando o agente atinge o limite de iterações"""
+    def __init__(self, max_iterations: int):
+        message = f"Agente atingiu o limite de {max_iterations} iterações"
+        super().__init__(message, "AGENT_MAX_ITERATIONS")
+
+class DeadlineExceededError(AIServiceError):
+    """Erro quando a requisição passa do prazo (deadline)"""
+    def __init__(self, message: str = "Prazo da requisição esgotado"):
+        super().__init__(message, "DEADLINE_EXCEEDED")
+
+class RequestCancelledError(AIServiceError):
+    """Erro quando a requisição é cancelada (ex.: cliente desconectou)"""
+    def __init__(self, message: str = "Requisição cancelada"):
+        super().__init__(message, "REQUEST_CANCELLED")
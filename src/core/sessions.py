@@ -0,0 +1,287 @@
+"""
+Sessões de chat com estado no servidor (usadas pelo WebSocket).
+É como a "comanda" do restaurante: o garçom guarda o pedido, o cliente só fala o que é novo.
+
+Benchmark de memória por sessão:
+    python -m src.core.sessions --sessions 10000 --turns 2 --connections 2000
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import logging
+import secrets
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from src.core.data_types import AIrequest, ChatMessage, MessageRole, ModelType
+from src.utils.helpers import calculate_tokens
+
+logger = logging.getLogger(__name__)
+
+_ROLES = list(MessageRole)
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+
+class ChatSession:
+    """
+    Estado de uma conversa, guardado de forma compacta.
+
+    Em vez de objetos ChatMessage, guarda só o texto e um byte de papel por
+    mensagem; cada mensagem é validada uma única vez, quando chega.
+
+    `token_count` é uma estimativa corrente, informada ao cliente: o
+    AIService ainda reconta os tokens do histórico a cada turno.
+    """
+
+    __slots__ = ("session_id", "api_key", "model", "roles", "contents", "token_count", "last_active")
+
+    def __init__(self, session_id: str, api_key: str, model: ModelType):
+        self.session_id = session_id
+        self.api_key = api_key
+        self.model = model
+        self.roles = bytearray()
+        self.contents: List[str] = []
+        self.token_count = 0
+        self.last_active = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def append(self, role: MessageRole, content: str, max_messages: Optional[int] = None) -> None:
+        """Adiciona uma mensagem já validada, descartando as mais antigas se passar do limite."""
+        self.roles.append(_ROLE_CODES[role])
+        self.contents.append(content)
+        self.token_count += calculate_tokens(content)
+        self.last_active = time.monotonic()
+
+        if max_messages is not None and len(self.contents) > max_messages:
+            self._drop_oldest(len(self.contents) - max_messages)
+
+    def pop(self) -> None:
+        """Remove a última mensagem (ex.: turno que falhou)."""
+        self.roles.pop()
+        self.token_count -= calculate_tokens(self.contents.pop())
+
+    def to_request(self) -> AIrequest:
+        """
+        Monta a AIrequest sem revalidar o histórico (cada mensagem foi
+        validada quando chegou). Os ChatMessage são recriados a cada turno.
+        """
+        messages = [
+            ChatMessage.model_construct(role=_ROLES[code], content=content)
+            for code, content in zip(self.roles, self.contents)
+        ]
+        return AIrequest.model_construct(model=self.model, messages=messages)
+
+    def _drop_oldest(self, count: int) -> None:
+        """Descarta as mensagens mais antigas que não são de sistema."""
+        system_code = _ROLE_CODES[MessageRole.SYSTEM]
+        keep = []
+        for position, code in enumerate(self.roles):
+            if count and code != system_code:
+                count -= 1
+                self.token_count -= calculate_tokens(self.contents[position])
+                continue
+            keep.append(position)
+        self.roles = bytearray(self.roles[position] for position in keep)
+        self.contents = [self.contents[position] for position in keep]
+
+
+class SessionManager:
+    """
+    Guarda as sessões ativas do worker.
+    Sessões sem atividade por mais de `ttl` segundos são descartadas.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 100000,
+        ttl: float = 3600.0,
+        max_messages: int = 200,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._sessions: Dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, api_key: str, model: ModelType) -> ChatSession:
+        """
+        Cria uma sessão nova.
+
+        Raises:
+            RuntimeError: Se o limite de sessões do worker foi atingido.
+        """
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self._evict_expired()
+                if len(self._sessions) >= self.max_sessions:
+                    raise RuntimeError("Limite de sessões atingido")
+
+            session = ChatSession(secrets.token_urlsafe(12), api_key, model)
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id: str, api_key: str) -> Optional[ChatSession]:
+        """Recupera uma sessão existente, desde que seja da mesma API key."""
+        session = self._sessions.get(session_id)
+        if session is None or not secrets.compare_digest(
+            session.api_key.encode("utf-8"), api_key.encode("utf-8")
+        ):
+            return None
+        if time.monotonic() - session.last_active > self.ttl:
+            self.close(session_id)
+            return None
+        return session
+
+    def close(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_expired(self) -> int:
+        """Remove sessões paradas há mais de `ttl` segundos. Retorna quantas saíram."""
+        with self._lock:
+            return self._evict_expired()
+
+    def _evict_expired(self) -> int:
+        cutoff = time.monotonic() - self.ttl
+        expired = [sid for sid, session in self._sessions.items() if session.last_active < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+        if expired:
+            logger.info(f"🧹 {len(expired)} sessões expiradas removidas")
+        return len(expired)
+
+
+session_manager = SessionManager(
+    max_sessions=settings.WS_MAX_SESSIONS,
+    ttl=settings.WS_SESSION_TTL,
+    max_messages=settings.WS_MAX_HISTORY_MESSAGES,
+)
+
+
+def benchmark(sessions: int, turns: int) -> Dict[str, float]:
+    """
+    Mede memória e tempo para criar N sessões com alguns turnos cada.
+    Cada sessão tem API key e textos próprios (nada de strings compartilhadas).
+    Mede só o estado da sessão; o custo da conexão é medido em `benchmark_connections`.
+    """
+    manager = SessionManager(max_sessions=sessions, max_messages=settings.WS_MAX_HISTORY_MESSAGES)
+    counter = itertools.count()
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+
+    for _ in range(sessions):
+        session = manager.create("sk-" + secrets.token_hex(20), ModelType.OPENAI)
+        for turn in range(turns):
+            number = next(counter)
+            session.append(MessageRole.USER, f"Pergunta {number} sobre o assunto do turno {turn}")
+            session.append(MessageRole.ASSISTANT, f"Entendi sua pergunta {number}! Aqui está uma resposta detalhada...")
+
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    session.to_request()  # aquecimento (pydantic monta validadores na primeira chamada)
+    request_started = time.perf_counter()
+    session.to_request()
+    request_time = time.perf_counter() - request_started
+
+    used = current - baseline
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "total_mb": round(used / 1024 / 1024, 2),
+        "peak_mb": round((peak - baseline) / 1024 / 1024, 2),
+        "bytes_per_session": round(used / sessions, 1),
+        "create_per_second": round(sessions / elapsed, 1),
+        "to_request_ms": round(request_time * 1000, 4),
+    }
+
+
+async def benchmark_connections(connections: int) -> Dict[str, float]:
+    """
+    Mede a memória de N conexões WebSocket ociosas no app, via ASGI em memória.
+
+    Inclui tudo que o app guarda por conexão: objeto WebSocket, task do
+    handler, task de leitura, fila de frames, espera do timeout ociosa e
+    a sessão vazia. Não inclui o transporte do servidor ASGI (uvicorn),
+    representado aqui só pelas duas filas de mensagens.
+    """
+    from main import app  # import tardio: main importa as rotas, que importam este módulo
+
+    async def connect(number: int):
+        inbound: asyncio.Queue = asyncio.Queue()
+        outbound: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": "/api/v1/ws/chat",
+            "raw_path": b"/api/v1/ws/chat",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"x-api-key", ("sk-" + secrets.token_hex(20)).encode())],
+            "client": ("127.0.0.1", 1024 + number % 60000),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        await inbound.put({"type": "websocket.connect"})
+        task = asyncio.create_task(app(scope, inbound.get, outbound.put))
+        await outbound.get()  # websocket.accept
+        await outbound.get()  # frame {"type": "session"}
+        return task, inbound
+
+    async def disconnect(clients) -> None:
+        for _, inbound in clients:
+            inbound.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(*(task for task, _ in clients), return_exceptions=True)
+
+    await disconnect([await connect(0)])  # aquecimento (rotas, validadores, logging)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    clients = [await connect(number) for number in range(connections)]
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await disconnect(clients)
+
+    used = current - baseline
+    return {
+        "connections": connections,
+        "total_mb": round(used / 1024 / 1024, 2),
+        "peak_mb": round((peak - baseline) / 1024 / 1024, 2),
+        "bytes_per_connection": round(used / connections, 1),
+        "connect_per_second": round(connections / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de memória das sessões de chat")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=0, help="Também mede N conexões WebSocket ociosas")
+    args = parser.parse_args()
+
+    print("🧪 Medindo sessões...")
+    for key, value in benchmark(args.sessions, args.turns).items():
+        print(f"{key}: {value}")
+
+    if args.connections:
+        print("🧪 Medindo conexões ociosas...")
+        for key, value in asyncio.run(benchmark_connections(args.connections)).items():
+            print(f"{key}: {value}")
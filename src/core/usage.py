@@ -0,0 +1,386 @@
+"""
+Contabilidade de uso e custo das requisições de IA.
+É como um "taxímetro" que registra cada corrida sem atrasar o passageiro.
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from src.core.data_types import ModelType
+
+logger = logging.getLogger(__name__)
+
+# Preço por 1K tokens (simulado), na mesma ordem de ModelType
+MODEL_PRICING = {
+    ModelType.OPENAI: {"input": 0.0025, "output": 0.01},
+    ModelType.GEMINI: {"input": 0.0003, "output": 0.0025},
+    ModelType.GROK: {"input": 0.00059, "output": 0.00079},
+}
+DEFAULT_PRICING = {"input": 0.001, "output": 0.002}
+
+_MODELS = list(ModelType)
+_MODEL_IDS = {model: index for index, model in enumerate(_MODELS)}
+_PRICE_INPUT = np.array([MODEL_PRICING.get(m, DEFAULT_PRICING)["input"] for m in _MODELS])
+_PRICE_OUTPUT = np.array([MODEL_PRICING.get(m, DEFAULT_PRICING)["output"] for m in _MODELS])
+
+USAGE_DTYPE = np.dtype([
+    ("seq", np.int64),          # posição + 1; 0 significa slot nunca escrito
+    ("key_id", np.int32),
+    ("model_id", np.int16),
+    ("input_tokens", np.int32),
+    ("output_tokens", np.int32),
+    ("latency", np.float32),
+    ("timestamp", np.float64),
+    ("cached", np.bool_),       # resposta do cache semântico: sem custo de provedor
+])
+
+STORED_COLUMNS = ["key", "key_hash", "model", "input_tokens", "output_tokens", "latency", "timestamp", "cached"]
+
+# Agrupar por "key" usa o hash da key completa; a máscara é só para exibição
+GROUP_COLUMNS = {"key": "key_hash", "model": "model"}
+
+
+def hash_api_key(api_key: str) -> bytes:
+    """Identificador estável da API key (SHA-256 truncado): filtra e agrupa sem guardar o segredo."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32].encode()
+
+
+def mask_api_key(api_key: str) -> str:
+    """
+    Mascara a API key para nunca gravar o segredo completo em disco.
+    Só para exibição: keys diferentes podem ter a mesma máscara.
+    """
+    if not api_key:
+        return "anonymous"
+    if len(api_key) <= 10:
+        return api_key[:2] + "..."
+    return f"{api_key[:6]}...{api_key[-4:]}"
+
+
+class UsageRecorder:
+    """
+    Registra uso por requisição num ring buffer baseado em array NumPy.
+
+    A escrita não usa lock: `itertools.count` reserva a posição de forma
+    atômica (sob o GIL) e o registro inteiro é gravado numa única atribuição
+    de array estruturado. O campo `seq` funciona como marca de "commit".
+    """
+
+    def __init__(self, capacity: int = 65536, storage_dir: Optional[str] = None, compact_every: int = 16):
+        self.capacity = capacity
+        self.storage_dir = storage_dir
+        self.compact_every = max(compact_every, 2)
+        self._lock = threading.Lock()
+        self._buffer = np.zeros(capacity, dtype=USAGE_DTYPE)
+        self._cursor = itertools.count()
+        self._flushed = 0
+        self._key_counter = itertools.count()
+        self._key_ids: Dict[str, int] = {}
+        self._key_labels: Dict[int, str] = {}
+        self._key_hashes: Dict[int, bytes] = {}
+
+    def record(
+        self,
+        api_key: str,
+        model: ModelType,
+        input_tokens: int,
+        output_tokens: int,
+        latency: float,
+        cached: bool = False,
+    ) -> None:
+        """
+        Adiciona um registro ao buffer. Caminho quente: O(1) e sem I/O.
+        `cached=True` marca respostas que não chamaram o provedor (custo zero).
+        """
+        position = next(self._cursor)
+        self._buffer[position % self.capacity] = (
+            position + 1,
+            self._key_id(api_key),
+            _MODEL_IDS.get(model, 0),
+            input_tokens,
+            output_tokens,
+            latency,
+            time.time(),
+            cached,
+        )
+
+    def flush(self) -> int:
+        """
+        Grava no disco, em formato colunar (.npz), os registros ainda não persistidos.
+
+        Depois de gravados, os registros não ficam em memória: `dataframe`
+        relê os arquivos. Sem `storage_dir` nada é gravado e os registros
+        ficam só no ring buffer (memória limitada a `capacity`).
+
+        Flush e leitura são serializados por um lock (só `record` fica sem
+        lock): um registro nunca é gravado duas vezes nem lido em dobro.
+
+        Returns:
+            Número de registros gravados.
+        """
+        if not self.storage_dir:
+            return 0
+
+        with self._lock:
+            records = self._collect_pending()
+            if records.size == 0:
+                return 0
+
+            frame = self._to_frame(records)
+            path = self._write(frame, level=0)
+            self._flushed = int(records["seq"][-1])
+            logger.info(f"💾 {len(frame)} registros de uso gravados em {path}")
+            self._compact()
+            return len(frame)
+
+    def compact(self) -> int:
+        """
+        Junta arquivos pequenos em arquivos maiores, em níveis (estilo LSM).
+
+        A cada `compact_every` arquivos de um nível, eles viram um arquivo do
+        nível seguinte; assim o número de arquivos cresce só com o log do total.
+
+        Returns:
+            Número de arquivos juntados.
+        """
+        with self._lock:
+            return self._compact()
+
+    def summary(
+        self,
+        group_by: Sequence[str] = ("key", "model"),
+        api_key: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Agrega uso e custo (persistido + pendente em memória).
+
+        Args:
+            group_by: Colunas de agrupamento ("key" e/ou "model").
+            api_key: Se informada, só o uso dessa API key entra na conta.
+
+        Returns:
+            Lista de agregados, um por grupo.
+        """
+        columns = [GROUP_COLUMNS[name] for name in group_by]
+        frame = self.dataframe(api_key)
+        if frame.empty:
+            return []
+
+        labels = {"key": ("key", "first")} if "key" in group_by else {}
+        grouped = frame.groupby(columns, sort=True).agg(
+            **labels,
+            requests=("input_tokens", "size"),
+            cached_requests=("cached", "sum"),
+            input_tokens=("input_tokens", "sum"),
+            output_tokens=("output_tokens", "sum"),
+            cost=("cost", "sum"),
+            latency_avg=("latency", "mean"),
+            latency_p95=("latency", lambda s: float(np.percentile(s, 95))),
+        )
+        grouped["cost"] = grouped["cost"].round(6)
+        grouped = grouped.reset_index().drop(columns="key_hash", errors="ignore")
+        front = [name for name in group_by if name in grouped]
+        grouped = grouped[front + [column for column in grouped.columns if column not in front]]
+        return grouped.to_dict(orient="records")
+
+    def dataframe(self, api_key: Optional[str] = None) -> pd.DataFrame:
+        """
+        Retorna os registros conhecidos (disco + pendentes) como DataFrame.
+
+        Os arquivos são relidos a cada chamada e, com `api_key`, filtrados
+        arquivo a arquivo (pelo hash da key completa, nunca pela máscara),
+        então só o resultado fica em memória.
+        """
+        key_hash = hash_api_key(api_key) if api_key is not None else None
+        with self._lock:
+            frames = list(self._load_storage(key_hash))
+            pending = self._collect_pending()
+        if pending.size:
+            frame = self._to_frame(pending)
+            frames.append(frame if key_hash is None else frame[frame["key_hash"] == key_hash])
+
+        if not frames:
+            return pd.DataFrame(columns=STORED_COLUMNS + ["cost"])
+
+        frame = _fill_legacy_columns(pd.concat(frames, ignore_index=True))
+        frame["cost"] = self._cost(frame)
+        return frame
+
+    def _key_id(self, api_key: str) -> int:
+        """Mapeia a API key para um inteiro estável no processo."""
+        key_id = self._key_ids.get(api_key)
+        if key_id is None:
+            candidate = next(self._key_counter)
+            self._key_labels[candidate] = mask_api_key(api_key)
+            self._key_hashes[candidate] = hash_api_key(api_key)
+            key_id = self._key_ids.setdefault(api_key, candidate)
+        return key_id
+
+    def _collect_pending(self) -> np.ndarray:
+        """Copia os registros confirmados desde o último flush, em ordem. Chamar com o lock."""
+        written = int(self._buffer["seq"].max())
+        start = self._flushed
+        if written <= start:
+            return self._buffer[:0].copy()
+
+        if written - start > self.capacity:
+            lost = written - start - self.capacity
+            logger.warning(f"⚠️ Ring buffer de uso sobrescreveu {lost} registros antes do flush")
+            start = written - self.capacity
+
+        positions = np.arange(start, written)
+        records = self._buffer[positions % self.capacity]
+
+        # Para no primeiro slot ainda não confirmado (escrita em andamento)
+        committed = records["seq"] == positions + 1
+        if not committed.all():
+            records = records[:int(np.argmin(committed))]
+        return records.copy()
+
+    def _to_frame(self, records: np.ndarray) -> pd.DataFrame:
+        """Converte registros do buffer em DataFrame com rótulos legíveis."""
+        model_names = np.array([model.value for model in _MODELS], dtype=object)
+        key_ids = pd.Series(records["key_id"])
+        return pd.DataFrame({
+            "key": key_ids.map(self._key_labels).to_numpy(),
+            "key_hash": key_ids.map(self._key_hashes).to_numpy(),
+            "model": model_names[records["model_id"]],
+            "input_tokens": records["input_tokens"].astype(np.int64),
+            "output_tokens": records["output_tokens"].astype(np.int64),
+            "latency": records["latency"].astype(np.float64),
+            "timestamp": records["timestamp"],
+            "cached": records["cached"],
+        })
+
+    def _load_storage(self, key_hash: Optional[bytes] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lê os arquivos colunares já gravados em disco, um DataFrame por arquivo.
+        Com `key_hash`, só as linhas dessa key (arquivos antigos, sem hash, ficam de fora).
+        Chamar com o lock.
+        """
+        for file_name in self._storage_files():
+            with np.load(os.path.join(self.storage_dir, file_name), allow_pickle=False) as data:
+                columns = [column for column in data.files if column != "sources"]
+                if key_hash is None:
+                    yield pd.DataFrame({column: data[column] for column in columns})
+                    continue
+                if "key_hash" not in columns:
+                    continue
+                rows = data["key_hash"] == key_hash
+                if rows.any():
+                    yield pd.DataFrame({column: data[column][rows] for column in columns})
+
+    def _storage_files(self) -> List[str]:
+        """
+        Arquivos de uso válidos, em ordem. Chamar com o lock.
+
+        Um arquivo juntado guarda o nome das suas origens; origens que
+        sobraram de uma compactação interrompida são apagadas, nunca lidas.
+        """
+        if not self.storage_dir or not os.path.isdir(self.storage_dir):
+            return []
+
+        names = sorted(name for name in os.listdir(self.storage_dir) if name.endswith(".npz"))
+        replaced = set()
+        for name in names:
+            if _file_level(name) > 0:
+                with np.load(os.path.join(self.storage_dir, name), allow_pickle=False) as data:
+                    replaced.update(data["sources"].tolist())
+
+        for name in replaced.intersection(names):
+            os.remove(os.path.join(self.storage_dir, name))
+        return [name for name in names if name not in replaced]
+
+    def _write(self, frame: pd.DataFrame, level: int, sources: Sequence[str] = ()) -> str:
+        """Grava um arquivo colunar de forma atômica (temporário + rename). Chamar com o lock."""
+        os.makedirs(self.storage_dir, exist_ok=True)
+        suffix = f".L{level}" if level else ""
+        path = os.path.join(self.storage_dir, f"usage-{time.time_ns()}{suffix}.npz")
+        columns = {
+            "key": frame["key"].to_numpy(dtype=str),
+            "key_hash": np.asarray(frame["key_hash"].tolist(), dtype=bytes),
+            "model": frame["model"].to_numpy(dtype=str),
+            "input_tokens": frame["input_tokens"].to_numpy(dtype=np.int64),
+            "output_tokens": frame["output_tokens"].to_numpy(dtype=np.int64),
+            "latency": frame["latency"].to_numpy(dtype=np.float64),
+            "timestamp": frame["timestamp"].to_numpy(dtype=np.float64),
+            "cached": frame["cached"].to_numpy(dtype=bool),
+        }
+        if sources:
+            columns["sources"] = np.asarray(list(sources), dtype=str)
+
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **columns)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def _compact(self) -> int:
+        """Compactação em níveis (ver `compact`). Chamar com o lock."""
+        merged = 0
+        level = 0
+        while True:
+            files = [name for name in self._storage_files() if _file_level(name) == level]
+            if len(files) < self.compact_every:
+                return merged
+
+            frames = []
+            for name in files:
+                with np.load(os.path.join(self.storage_dir, name), allow_pickle=False) as data:
+                    frames.append(pd.DataFrame({
+                        column: data[column] for column in data.files if column != "sources"
+                    }))
+            frame = _fill_legacy_columns(pd.concat(frames, ignore_index=True))
+            path = self._write(frame, level + 1, sources=files)
+            for name in files:
+                os.remove(os.path.join(self.storage_dir, name))
+
+            logger.info(f"🗜️ {len(files)} arquivos de uso juntados em {path}")
+            merged += len(files)
+            level += 1
+
+    @staticmethod
+    def _cost(frame: pd.DataFrame) -> np.ndarray:
+        """Calcula custo vetorizado a partir da tabela de preços por modelo (hits de cache custam zero)."""
+        model_ids = frame["model"].map(
+            {model.value: index for index, model in enumerate(_MODELS)}
+        ).fillna(-1).to_numpy(dtype=np.int64)
+        known = model_ids >= 0
+        price_in = np.where(known, _PRICE_INPUT[model_ids.clip(0)], DEFAULT_PRICING["input"])
+        price_out = np.where(known, _PRICE_OUTPUT[model_ids.clip(0)], DEFAULT_PRICING["output"])
+        cost = (
+            frame["input_tokens"].to_numpy() * price_in
+            + frame["output_tokens"].to_numpy() * price_out
+        ) / 1000
+        return np.where(frame["cached"].to_numpy(dtype=bool), 0.0, cost)
+
+
+def _file_level(file_name: str) -> int:
+    """Nível de compactação pelo nome: usage-<ns>.npz é 0, usage-<ns>.L<n>.npz é n."""
+    parts = file_name.split(".")
+    return int(parts[1][1:]) if len(parts) == 3 else 0
+
+
+def _fill_legacy_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Completa colunas que não existiam em arquivos antigos ("cached", "key_hash")."""
+    frame["cached"] = frame["cached"].fillna(False).astype(bool) if "cached" in frame else False
+    if "key_hash" not in frame:
+        frame["key_hash"] = None
+    legacy = frame["key_hash"].isna()
+    frame.loc[legacy, "key_hash"] = frame.loc[legacy, "key"].map(lambda label: f"legacy:{label}".encode())
+    return frame
+
+
+usage_recorder = UsageRecorder(
+    capacity=settings.USAGE_BUFFER_SIZE,
+    storage_dir=settings.USAGE_STORAGE_DIR,
+    compact_every=settings.USAGE_COMPACT_FILES,
+)
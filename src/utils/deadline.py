@@ -0,0 +1,192 @@
+"""
+Deadlines por requisição e cancelamento cooperativo.
+É como o "cronômetro da prova": quando o tempo acaba, ninguém continua escrevendo.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from fastapi import Header, HTTPException
+
+from config.settings import settings
+from src.core.exception import DeadlineExceededError, RequestCancelledError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    Prazo absoluto de uma requisição, compartilhado entre event loop e threads.
+
+    O trabalho em andamento checa o prazo em pontos seguros (`check`, `sleep`);
+    `cancel` acorda na hora qualquer `sleep` em curso.
+    """
+
+    __slots__ = ("expires_at", "reason", "_cancelled")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Cria um deadline daqui a `seconds` segundos."""
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Segundos restantes (0 se já expirou)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "Requisição cancelada") -> None:
+        """Cancela o trabalho ligado a este deadline."""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self) -> None:
+        """
+        Interrompe o trabalho se a requisição foi cancelada ou expirou.
+
+        Raises:
+            RequestCancelledError: Se `cancel` foi chamado.
+            DeadlineExceededError: Se o prazo acabou.
+        """
+        if self._cancelled.is_set():
+            raise RequestCancelledError(self.reason or "Requisição cancelada")
+        if self.expired:
+            raise DeadlineExceededError()
+
+    def sleep(self, seconds: float) -> None:
+        """Dorme respeitando o prazo: acorda cedo se cancelado e falha na hora se não couber."""
+        self.check()
+        if seconds > self.remaining():
+            raise DeadlineExceededError()
+        self._cancelled.wait(seconds)
+        self.check()
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline da requisição atual (propaga para threads via contextvars)."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Define o deadline atual dentro do bloco."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def check_deadline() -> None:
+    """Checa o deadline atual, se houver."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def deadline_sleep(seconds: float) -> None:
+    """`time.sleep` que respeita o deadline atual."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
+
+
+def request_deadline(default_timeout: float) -> Callable[..., Deadline]:
+    """
+    Dependency do FastAPI que cria o deadline da requisição.
+
+    Usa o header X-Request-Timeout (segundos) ou o padrão da rota,
+    limitado a MAX_REQUEST_TIMEOUT.
+
+    Uso:
+        @router.post("/rota")
+        async def rota(deadline: Deadline = Depends(request_deadline(30.0))):
+            # código aqui
+    """
+    def dependency(
+        request_timeout: Optional[str] = Header(None, alias="X-Request-Timeout"),
+    ) -> Deadline:
+        timeout = default_timeout
+        if request_timeout is not None:
+            try:
+                timeout = float(request_timeout)
+            except ValueError:
+                timeout = 0.0
+            if not math.isfinite(timeout) or timeout <= 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail="X-Request-Timeout deve ser um número de segundos maior que zero"
+                )
+        return Deadline.after(min(timeout, settings.MAX_REQUEST_TIMEOUT))
+
+    return dependency
+
+
+async def run_with_deadline(
+    work: Awaitable[T],
+    deadline: Deadline,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    poll_interval: float = 0.5,
+) -> T:
+    """
+    Aguarda o trabalho até o deadline, cancelando-o se o prazo acabar ou o cliente desconectar.
+
+    Args:
+        work: Corrotina/future com o trabalho da requisição.
+        deadline: Prazo da requisição.
+        is_disconnected: Função async que diz se o cliente foi embora.
+        poll_interval: Intervalo para checar desconexão.
+
+    Raises:
+        DeadlineExceededError: Se o prazo acabou.
+        RequestCancelledError: Se o cliente desconectou.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            timeout = deadline.remaining()
+            if is_disconnected is not None:
+                timeout = min(timeout, poll_interval)
+
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+
+            if deadline.expired:
+                deadline.cancel("Prazo da requisição esgotado")
+                logger.warning("⏰ Deadline esgotado, cancelando trabalho em andamento")
+                raise DeadlineExceededError()
+
+            if is_disconnected is not None and await is_disconnected():
+                deadline.cancel("Cliente desconectou")
+                logger.warning("🔌 Cliente desconectou, cancelando trabalho em andamento")
+                raise RequestCancelledError("Cliente desconectou")
+    finally:
+        if not task.done():
+            deadline.cancel()
+            task.cancel()
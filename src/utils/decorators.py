@@ -1,9 +1,14 @@
 import time
 import functools
+import inspect
 from typing import Callable, Any, Dict
 from datetime import datetime
 import logging
 
+from src.core.exception import DeadlineExceededError, RequestCancelledError
+from src.utils.deadline import check_deadline, current_deadline, deadline_sleep
+from src.utils.profiling import span
+
 logger = logging.getLogger(__name__)
 
 def timer(func: Callable) -> Callable:
@@ -14,7 +19,32 @@ def timer(func: Callable) -> Callable:
         @timer
         def minha_funcao():
             # código aqui
+
+    Funciona também com funções async (mede o tempo até o await terminar).
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time.time()
+
+            try:
+                result = await func(*args, **kwargs)
+                execution_time = time.time() - start_time
+
+                logger.info(
+                    f"⏱️ {func.__name__} executada em {execution_time:.4f}s"
+                )
+                return result
+
+            except Exception as e:
+                execution_time = time.time() - start_time
+                logger.error(
+                    f"❌ {func.__name__} falhou em {execution_time:.4f}s: {e}"
+                )
+                raise
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
@@ -40,6 +70,8 @@ def timer(func: Callable) -> Callable:
 def retry(max_attempts: int = 3, delay: float = 1.0):
     """
     Decorator que tenta executar função várias vezes.
+    Respeita o deadline da requisição: não tenta de novo se a próxima
+    tentativa (espera + duração da anterior) não couber no prazo.
     Uso:
         @retry(max_attempts=3, delay=2.0)
         def funcao_que_pode_falhar():
@@ -51,9 +83,14 @@ def retry(max_attempts: int = 3, delay: float = 1.0):
             last_exception = None
             
             for attempt in range(max_attempts):
+                check_deadline()
+                attempt_start = time.monotonic()
                 try:
                     return func(*args, **kwargs)
-                    
+
+                except (DeadlineExceededError, RequestCancelledError):
+                    raise
+
                 except Exception as e:
                     last_exception = e
                     logger.warning(
@@ -61,9 +98,17 @@ def retry(max_attempts: int = 3, delay: float = 1.0):
                     )
                     
                     if attempt < max_attempts - 1:
-                        time.sleep(delay)
+                        deadline = current_deadline()
+                        attempt_duration = time.monotonic() - attempt_start
+                        if deadline is not None and deadline.remaining() < delay + attempt_duration:
+                            logger.warning(
+                                f"⏭️ Retry de {func.__name__} ignorado: não cabe no prazo restante "
+                                f"({deadline.remaining():.2f}s)"
+                            )
+                            break
+                        deadline_sleep(delay)
                     
-            logger.error(f"❌ {func.__name__} falhou após {max_attempts} tentativas")
+            logger.error(f"❌ {func.__name__} falhou após {attempt + 1} tentativas")
             raise last_exception
             
         return wrapper
@@ -88,8 +133,10 @@ def cache_result(duration_seconds: int = 300):
             current_time = time.time()
             
             # Verifica se tem cache válido
-            if cache_key in cache:
-                cached_result, cached_time = cache[cache_key]
+            with span("cache_lookup"):
+                cached = cache.get(cache_key)
+            if cached is not None:
+                cached_result, cached_time = cached
                 if current_time - cached_time < duration_seconds:
                     logger.info(f"📦 Cache hit para {func.__name__}")
                     return cached_result
@@ -127,19 +174,33 @@ def validate_api_key_decorator(func: Callable) -> Callable:
 def log_calls(include_args: bool = False):
     """
     Decorator que registra chamadas de funções.
+    Funciona também com funções async.
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
+        def log_start(args, kwargs) -> str:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
+
             if include_args:
                 logger.info(
                     f"📞 [{timestamp}] Chamando {func.__name__} com args={args}, kwargs={kwargs}"
                 )
             else:
                 logger.info(f"📞 [{timestamp}] Chamando {func.__name__}")
-            
+            return timestamp
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                timestamp = log_start(args, kwargs)
+                result = await func(*args, **kwargs)
+                logger.info(f"✅ [{timestamp}] {func.__name__} concluída")
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timestamp = log_start(args, kwargs)
             result = func(*args, **kwargs)
             
             logger.info(f"✅ [{timestamp}] {func.__name__} concluída")
@@ -1,24 +1,19 @@
-# Definições de exceções customizadas
-class AIServiceError(Exception):
-    def __init__(self, error_code: str, message: str):
-        self.error_code = error_code
-        self.message = message
-
-class InvalidAPIKeyError(AIServiceError):
-    pass
-class ModelNotFoundError(AIServiceError):
-    pass
-class RateLimitError(AIServiceError):
-    pass
-class TokenLimitExceededError(AIServiceError):
-    pass
-
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 import logging
 from datetime import datetime
 from typing import Dict, Any
 
+from src.core.exception import (
+    AIServiceError,
+    DeadlineExceededError,
+    RequestCancelledError,
+    InvalidAPIKeyError,
+    ModelNotFoundError,
+    RateLimitError,
+    TokenLimitExceededError,
+)
+
 logger = logging.getLogger(__name__)
 
 async def global_exception_handler(request: Request, exc: Exception):
@@ -53,6 +48,10 @@ async def ai_service_exception_handler(request: Request, exc: AIServiceError):
         status_code = 429
     elif isinstance(exc, TokenLimitExceededError):
         status_code = 413
+    elif isinstance(exc, DeadlineExceededError):
+        status_code = 504
+    elif isinstance(exc, RequestCancelledError):
+        status_code = 499
     
     logger.error(f"Erro de IA: {exc.error_code} - {exc.message}")
     
@@ -0,0 +1,186 @@
+"""
+Ferramentas de profiling: spans por requisição e profiler por amostragem.
+É como um "raio-X" que mostra onde o tempo de cada requisição foi gasto.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+_NOOP_SPAN = nullcontext()
+
+
+class RequestTrace:
+    """Spans coletados durante uma requisição."""
+
+    __slots__ = ("request_id", "path", "started_at", "duration", "spans")
+
+    def __init__(self, request_id: str, path: str = ""):
+        self.request_id = request_id
+        self.path = path
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.spans: List[tuple] = []
+
+    def add(self, name: str, start: float, duration: float) -> None:
+        """Registra um span (nome, início relativo, duração) em segundos."""
+        self.spans.append((name, start, duration))
+
+    def totals(self) -> Dict[str, float]:
+        """Soma a duração dos spans por nome."""
+        totals: Dict[str, float] = {}
+        for name, _, duration in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    def server_timing(self) -> str:
+        """Formata os totais no padrão do header Server-Timing (em ms)."""
+        return ", ".join(
+            f"{name};dur={duration * 1000:.2f}" for name, duration in self.totals().items()
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for name, start, duration in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+_trace_origin: ContextVar[float] = ContextVar("trace_origin", default=0.0)
+
+
+def span(name: str):
+    """
+    Mede um trecho da requisição atual.
+
+    Uso:
+        with span("validation"):
+            # código aqui
+
+    Sem trace ativo devolve um context manager vazio (custo quase zero).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _timed_span(trace, name)
+
+
+@contextmanager
+def _timed_span(trace: RequestTrace, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        trace.add(name, start - _trace_origin.get(), end - start)
+
+
+class TraceStore:
+    """Guarda os traces mais recentes, limitados por quantidade."""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._traces: "OrderedDict[str, RequestTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, request_id: str, path: str = ""):
+        """Inicia um trace e o torna o trace atual do contexto."""
+        trace = RequestTrace(request_id, path)
+        return trace, (_current_trace.set(trace), _trace_origin.set(time.perf_counter()))
+
+    def finish(self, trace: RequestTrace, tokens) -> None:
+        """Encerra o trace atual e o guarda no histórico."""
+        trace_token, origin_token = tokens
+        trace.duration = time.perf_counter() - _trace_origin.get()
+        _current_trace.reset(trace_token)
+        _trace_origin.reset(origin_token)
+
+        with self._lock:
+            self._traces[trace.request_id] = trace
+            self._traces.move_to_end(trace.request_id)
+            while len(self._traces) > self.max_size:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[RequestTrace]:
+        with self._lock:
+            return self._traces.get(request_id)
+
+    def recent(self, limit: int = 50) -> List[RequestTrace]:
+        with self._lock:
+            return list(self._traces.values())[-limit:][::-1]
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem de todas as threads do processo.
+
+    Em intervalos fixos lê `sys._current_frames()` e conta as pilhas.
+    O resultado sai no formato "collapsed stacks" (uma pilha por linha,
+    frames separados por ';' e a contagem no final), aceito por
+    flamegraph.pl, speedscope e inferno. Desligado, não custa nada.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float) -> str:
+        """
+        Amostra o processo por `seconds` segundos (bloqueante).
+
+        Raises:
+            RuntimeError: Se outro profiling já estiver em andamento.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Já existe um profiling em andamento")
+
+        try:
+            stacks: Counter = Counter()
+            own_thread = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            deadline = time.perf_counter() + seconds
+
+            while time.perf_counter() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+                time.sleep(self.interval)
+
+            return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        """Converte um frame em pilha "thread;raiz;...;folha"."""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        # flamegraph.pl separa a contagem pelo último espaço, então espaços nos frames são aceitos
+        return ";".join(reversed(parts))
+
+
+trace_store = TraceStore(max_size=settings.TRACE_HISTORY_SIZE)
+sampling_profiler = SamplingProfiler(interval=settings.PROFILE_SAMPLE_INTERVAL)
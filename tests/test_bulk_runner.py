@@ -0,0 +1,107 @@
+"""
+Testes do BulkRunner: saída em ordem, números de linha reais e retomada pelo checkpoint.
+O provedor é trocado por um stub determinístico, sem rede nem sleeps.
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.core.ai_service import AIService
+from src.core.bulk_runner import BulkRunner
+
+API_KEY = "sk-" + "t" * 40
+
+
+def _write_input(path, count: int):
+    """Grava `count` requisições com algumas linhas vazias no meio; retorna os números das linhas com conteúdo."""
+    line_numbers = []
+    with open(path, "w", encoding="utf-8") as f:
+        line_number = 0
+        for number in range(count):
+            if number % 7 == 3:
+                f.write("\n")
+                line_number += 1
+            request = {"id": number, "model": "gpt-4o", "messages": [{"role": "user", "content": f"pergunta {number}"}]}
+            f.write(json.dumps(request) + "\n")
+            line_number += 1
+            line_numbers.append(line_number)
+    return line_numbers
+
+
+def _service(block_on: str = None, started: threading.Event = None, release: threading.Event = None) -> AIService:
+    """AIService sem registro de uso e com resposta determinística; pode travar numa pergunta."""
+    service = AIService(usage=None)
+
+    def respond(request):
+        content = request.messages[-1].content
+        if content == block_on:
+            started.set()
+            release.wait(10)
+        return f"resposta: {content}"
+
+    service._mock_ai_response = respond
+    return service
+
+
+def _read_output(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_output_is_ordered_with_real_line_numbers(tmp_path):
+    input_path, output_path = tmp_path / "entrada.jsonl", tmp_path / "saida.jsonl"
+    line_numbers = _write_input(input_path, 60)
+    with open(input_path, "a", encoding="utf-8") as f:
+        f.write("isto não é json\n")
+
+    runner = BulkRunner(_service(), API_KEY, concurrency=8, chunk_size=16)
+    stats = asyncio.run(runner.run(str(input_path), str(output_path)))
+
+    records = _read_output(output_path)
+    assert stats["processed"] == 61
+    assert stats["errors"] == 1
+    assert [record["id"] for record in records[:60]] == list(range(60))
+    assert [record["line"] for record in records[:60]] == line_numbers
+    assert records[0]["response"]["response"] == "resposta: pergunta 0"
+    assert records[60]["line"] == line_numbers[-1] + 1
+    assert "error" in records[60]
+
+
+def test_resume_after_interruption_continues_from_checkpoint(tmp_path):
+    input_path, output_path = tmp_path / "entrada.jsonl", tmp_path / "saida.jsonl"
+    checkpoint_path = tmp_path / "saida.jsonl.checkpoint"
+    line_numbers = _write_input(input_path, 300)
+
+    started, release = threading.Event(), threading.Event()
+    service = _service(block_on="pergunta 137", started=started, release=release)
+    runner = BulkRunner(service, API_KEY, concurrency=4, chunk_size=32, checkpoint_every=50)
+
+    async def interrupted_run():
+        task = asyncio.create_task(runner.run(str(input_path), str(output_path)))
+        assert await asyncio.to_thread(started.wait, 10)
+        await asyncio.sleep(0.2)  # deixa as linhas anteriores serem gravadas
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        asyncio.run(interrupted_run())
+    finally:
+        release.set()
+
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    assert checkpoint["lines_done"] == 100
+    assert len(_read_output(output_path)) == 137  # gravado além do checkpoint, antes da "queda"
+
+    runner = BulkRunner(_service(), API_KEY, concurrency=4, chunk_size=32, checkpoint_every=50)
+    stats = asyncio.run(runner.run(str(input_path), str(output_path)))
+
+    records = _read_output(output_path)
+    assert stats["resumed_from"] == 100
+    assert stats["processed"] == 200
+    assert [record["id"] for record in records] == list(range(300))
+    assert [record["line"] for record in records] == line_numbers
+    assert all(record["response"]["response"] == f"resposta: pergunta {record['id']}" for record in records)
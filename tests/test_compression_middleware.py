@@ -0,0 +1,122 @@
+"""
+Testes do CompressionMiddleware: negociação de Accept-Encoding, descompressão
+do corpo em streaming e proteção contra bombas de descompressão.
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.api.middleware import CompressionMiddleware, choose_encoding
+
+zstandard = pytest.importorskip("zstandard")
+
+MAX_BODY = 1024 * 1024
+COMPRESSORS = {
+    "gzip": gzip.compress,
+    "zstd": lambda data: zstandard.ZstdCompressor().compress(data),
+}
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body), "data": json.loads(body)}
+
+    @app.get("/big")
+    async def big():
+        return {"text": "resposta repetitiva " * 500}
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, max_body_size=MAX_BODY)
+    return TestClient(app)
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return _client()
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed_request_body_round_trip(client, encoding):
+    payload = {"mensagem": "olá " * 2000}
+    body = json.dumps(payload).encode()
+
+    response = client.post(
+        "/echo",
+        content=COMPRESSORS[encoding](body),
+        headers={"content-encoding": encoding, "content-type": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"size": len(body), "data": payload}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_response_is_compressed_with_accepted_encoding(client, encoding):
+    response = client.get("/big", headers={"accept-encoding": encoding})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["text"].startswith("resposta repetitiva")
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get("/small", headers={"accept-encoding": "gzip, zstd"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_decompression_bomb_is_rejected(client, encoding):
+    bomb = COMPRESSORS[encoding](b"\0" * (64 * MAX_BODY))
+
+    response = client.post("/echo", content=bomb, headers={"content-encoding": encoding})
+
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_truncated_body_is_rejected(client, encoding):
+    body = COMPRESSORS[encoding](json.dumps({"mensagem": "texto " * 500}).encode())
+
+    response = client.post("/echo", content=body[:-8], headers={"content-encoding": encoding})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_corrupt_body_is_rejected(client, encoding):
+    response = client.post("/echo", content=b"isto nao esta comprimido", headers={"content-encoding": encoding})
+
+    assert response.status_code == 400
+
+
+def test_unknown_content_encoding_is_rejected(client):
+    response = client.post("/echo", content=b"{}", headers={"content-encoding": "br"})
+
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, zstd", "zstd"),
+    ("gzip", "gzip"),
+    ("zstd;q=0.5, gzip", "gzip"),
+    ("*", "zstd"),
+    ("gzip;q=0, identity", None),
+    ("", None),
+])
+def test_choose_encoding(accept, expected):
+    assert choose_encoding(accept) == expected
@@ -0,0 +1,161 @@
+"""
+Testes dos embeddings locais, do índice vetorial e do cache semântico.
+Tudo roda offline: o embedding é determinístico e o corpus é gerado com seed fixa.
+"""
+
+import numpy as np
+import pytest
+
+from src.core.embeddings import SemanticCache, VectorIndex, embed_text, embed_texts
+
+DIM = 64
+
+
+def _clustered_corpus(size: int = 2000, clusters: int = 20, seed: int = 42) -> np.ndarray:
+    """Vetores normalizados agrupados em torno de centros aleatórios."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    vectors = centers[rng.integers(clusters, size=size)] + 0.3 * rng.normal(size=(size, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_expected)) for row_found, row_expected in zip(found, expected))
+    return hits / expected.size
+
+
+def test_embed_text_is_deterministic():
+    first = embed_text("Qual a capital da França?", DIM)
+    second = embed_text("Qual a capital da França?", DIM)
+
+    assert first.dtype == np.float32
+    assert first.shape == (DIM,)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_embed_text_is_l2_normalized():
+    vectors = embed_texts(["olá mundo", "uma frase bem mais longa sobre vetores", "x"], DIM)
+
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_embed_text_of_empty_text_is_zero():
+    np.testing.assert_array_equal(embed_text("", DIM), np.zeros(DIM, dtype=np.float32))
+
+
+def test_similar_texts_are_closer_than_unrelated_ones():
+    query = embed_text("qual a capital da frança", DIM)
+    similar = embed_text("qual é a capital da frança?", DIM)
+    unrelated = embed_text("receita de bolo de cenoura", DIM)
+
+    assert query @ similar > query @ unrelated
+
+
+def test_flat_search_returns_exact_neighbors():
+    corpus = _clustered_corpus()
+    index = VectorIndex(DIM)
+    index.add(corpus, np.arange(len(corpus)))
+
+    queries = corpus[:50]
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :10]
+    _, ids = index.search(queries, k=10)
+
+    assert _recall(ids, expected) == 1.0
+    np.testing.assert_array_equal(ids[:, 0], np.arange(50))
+
+
+def test_ivf_recall_close_to_flat():
+    corpus = _clustered_corpus()
+    index = VectorIndex(DIM)
+    index.add(corpus, np.arange(len(corpus)))
+    index.build_ivf(nlist=32, seed=0)
+    index.nprobe = 8
+
+    queries = corpus[:200]
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :10]
+    _, ids = index.search(queries, k=10)
+
+    assert index.mode == "ivf"
+    assert _recall(ids, expected) >= 0.9
+
+
+@pytest.mark.parametrize("use_ivf", [False, True])
+def test_save_and_load_with_mmap_round_trip(tmp_path, use_ivf):
+    corpus = _clustered_corpus(size=500)
+    index = VectorIndex(DIM)
+    index.add(corpus, np.arange(1000, 1500))
+    if use_ivf:
+        index.build_ivf(nlist=16, seed=0)
+
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path), mmap=True)
+
+    assert loaded.mode == index.mode
+    assert len(loaded) == len(index)
+    assert isinstance(loaded._ids, np.memmap)
+    expected_scores, expected_ids = index.search(corpus[:20], k=5)
+    scores, ids = loaded.search(corpus[:20], k=5)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+
+def test_loaded_mmap_index_accepts_new_vectors(tmp_path):
+    corpus = _clustered_corpus(size=100)
+    index = VectorIndex(DIM)
+    index.add(corpus[:50], np.arange(50))
+    index.save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path), mmap=True)
+    loaded.add(corpus[50:], np.arange(50, 100))
+
+    _, ids = loaded.search(corpus[75], k=1)
+    assert ids[0, 0] == 75
+
+
+def test_semantic_cache_ring_overwrites_oldest_entries():
+    cache = SemanticCache(threshold=0.99, max_entries=3, dim=DIM)
+    scope = cache.scope("sk-teste", "gpt-4o", "", 0.7, None)
+    for number in range(5):
+        cache.store(scope, cache.embed(f"pergunta número {number}"), f"resposta {number}")
+
+    assert len(cache) == 3
+    assert cache.lookup(scope, cache.embed("pergunta número 0")) is None
+    assert cache.lookup(scope, cache.embed("pergunta número 1")) is None
+    assert cache.lookup(scope, cache.embed("pergunta número 4")) == "resposta 4"
+
+
+def test_semantic_cache_does_not_cross_scopes():
+    cache = SemanticCache(max_entries=10, dim=DIM)
+    vector = cache.embed("Qual a capital da França?")
+    cache.store(cache.scope("sk-cliente-a", "gpt-4o", "", 0.7, None), vector, "Paris")
+
+    assert cache.lookup(cache.scope("sk-cliente-a", "gpt-4o", "", 0.7, None), vector) == "Paris"
+    assert cache.lookup(cache.scope("sk-cliente-b", "gpt-4o", "", 0.7, None), vector) is None
+    assert cache.lookup(cache.scope("sk-cliente-a", "gpt-4o", "user: outro contexto", 0.7, None), vector) is None
+    assert cache.lookup(cache.scope("sk-cliente-a", "gpt-4o", "", 0.0, None), vector) is None
+    assert cache.lookup(cache.scope("sk-cliente-a", "gpt-4o", "", 0.7, 50), vector) is None
+
+
+def test_semantic_cache_default_threshold_does_not_mix_opposite_questions():
+    cache = SemanticCache(max_entries=10, dim=DIM)
+    scope = cache.scope("sk-teste", "gpt-4o", "", 0.7, None)
+    cache.store(scope, cache.embed("Qual a soma dos números pares de 1 a 10?"), "30")
+
+    assert cache.lookup(scope, cache.embed("Qual a soma dos números ímpares de 1 a 10?")) is None
+    assert cache.lookup(scope, cache.embed("Qual a média dos números pares de 1 a 10?")) is None
+    assert cache.lookup(scope, cache.embed("qual a soma dos números pares de 1 a 10")) == "30"
+
+
+def test_semantic_cache_uses_custom_embedder():
+    calls = []
+
+    def embedder(text):
+        calls.append(text)
+        return np.ones(DIM, dtype=np.float32) / np.sqrt(DIM)
+
+    cache = SemanticCache(max_entries=10, dim=DIM, embedder=embedder)
+    scope = cache.scope("sk-teste", "gpt-4o", "", 0.7, None)
+    cache.store(scope, cache.embed("primeira"), "resposta")
+
+    assert cache.lookup(scope, cache.embed("qualquer outra")) == "resposta"
+    assert calls == ["primeira", "qualquer outra"]